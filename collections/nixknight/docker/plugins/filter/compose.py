@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: compose_service_order
+short_description: Order compose services so every service follows its dependencies
+version_added: "0.1.7"
+description:
+  - Take the C(services) mapping of a compose file and return the service
+    names in dependency order, so each service comes after the services
+    listed in its C(depends_on).
+  - Services that do not depend on each other keep the order they are
+    declared in. Dependencies on services not in the mapping are ignored.
+  - Both the short (list) and long (mapping) C(depends_on) syntax are
+    accepted. A dependency cycle is an error.
+options:
+  _input:
+    description: The C(services) mapping of a compose file.
+    type: dict
+    required: true
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Roll out services dependencies first
+  ansible.builtin.debug:
+    msg: "{{ compose.services | nixknight.docker.compose_service_order }}"
+'''
+
+RETURN = r'''
+_value:
+  description: Service names, dependencies first.
+  type: list
+  elements: str
+'''
+
+from ansible.errors import AnsibleFilterError
+from ansible.module_utils.common.collections import is_sequence
+from ansible.module_utils.six import string_types
+
+
+def _dependencies(service):
+    """Names in a service's depends_on, short or long syntax."""
+    depends_on = (service or {}).get('depends_on') or []
+    if isinstance(depends_on, dict):
+        return list(depends_on)
+    if isinstance(depends_on, string_types) or not is_sequence(depends_on):
+        raise AnsibleFilterError("depends_on must be a list or a mapping: %r" % (depends_on,))
+    return list(depends_on)
+
+
+def compose_service_order(services):
+    """Return service names in dependency order (Kahn's algorithm, declaration-stable)."""
+    if not isinstance(services, dict):
+        raise AnsibleFilterError("compose_service_order expects the compose services mapping")
+
+    names = list(services)
+    pending = dict(
+        (name, set(dep for dep in _dependencies(services[name]) if dep in services and dep != name))
+        for name in names
+    )
+    ordered = []
+    while pending:
+        ready = [name for name in names if name in pending and not pending[name]]
+        if not ready:
+            raise AnsibleFilterError(
+                "compose services have a depends_on cycle: %s" % ', '.join(sorted(pending)))
+        for name in ready:
+            ordered.append(name)
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+class FilterModule(object):
+
+    def filters(self):
+        return {
+            'compose_service_order': compose_service_order,
+        }
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+"""Helpers shared by the nixknight.docker modules that talk to the daemon."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import re
+
+try:
+    import docker
+    from docker.errors import DockerException
+    HAS_DOCKER = True
+    DOCKER_IMPORT_ERROR = None
+except ImportError as imp_exc:
+    HAS_DOCKER = False
+    DOCKER_IMPORT_ERROR = imp_exc
+
+try:
+    from urllib3.exceptions import HTTPError
+except ImportError:
+    HTTPError = Exception  # type: ignore[misc]
+
+
+# Connection options accepted by every module that builds a Docker client.
+DOCKER_CLIENT_ARGUMENT_SPEC = dict(
+    docker_host=dict(type='str', required=False, default=None),
+    tls=dict(type='dict', required=False, default=None, no_log=False),
+)
+
+# Reject empty, NUL byte, ASCII control chars, and any whitespace inside the
+# reference. The Docker SDK itself enforces the remainder of the
+# distribution-spec grammar (incl. valid registry-host-with-port references
+# like `registry.example.com:5000/foo`).
+BAD_IMAGE_CHARS = re.compile(r'[\x00-\x1f\s]')
+
+
+def sanitize_image_name(module, image_name):
+    """Minimal sanitation: defer full validation to the Docker SDK."""
+    if not isinstance(image_name, str) or not image_name:
+        module.fail_json(msg="image name must be a non-empty string: %r" % (image_name,))
+    if BAD_IMAGE_CHARS.search(image_name):
+        module.fail_json(
+            msg="image name contains control or whitespace characters: %r"
+            % (image_name,)
+        )
+    return image_name
+
+
+def sanitize_image_tag(module, image_tag):
+    """Minimal sanitation for the tag component."""
+    if not isinstance(image_tag, str) or not image_tag:
+        module.fail_json(msg="image tag must be a non-empty string: %r" % (image_tag,))
+    if BAD_IMAGE_CHARS.search(image_tag):
+        module.fail_json(
+            msg="image tag contains control or whitespace characters: %r" % (image_tag,)
+        )
+    return image_tag
+
+
+def normalize_repository(repository):
+    """Return the short form Docker uses for a repository in RepoTags.
+
+    C(docker.io/library/postgres) and C(postgres) name the same repository;
+    the daemon reports the latter, so both spellings are folded to it.
+    """
+    for prefix in ('docker.io/', 'index.docker.io/'):
+        if repository.startswith(prefix):
+            repository = repository[len(prefix):]
+            if repository.startswith('library/') and repository.count('/') == 1:
+                repository = repository[len('library/'):]
+            break
+    return repository
+
+
+def split_reference(reference):
+    """Split C(repo:tag) into C((repo, tag)); a registry port is not a tag."""
+    repository, sep, tag = reference.rpartition(':')
+    if not sep or '/' in tag:
+        return reference, None
+    return repository, tag
+
+
+def daemon_timestamp(seconds):
+    """Format a Unix time the way the events endpoint parses C(since)/C(until)."""
+    return "%d.%09d" % (int(seconds), int((seconds % 1) * 1e9))
+
+
+def build_docker_client(module, module_name, docker_host, tls_params, ping=True, **client_kwargs):
+    """Construct a DockerClient honoring optional docker_host / tls settings.
+
+    Extra keyword arguments (for example C(timeout) or C(max_pool_size)) are
+    passed straight to the client. With C(ping=False) the connection check is
+    left to the caller's first request, saving a round-trip.
+    """
+    if not HAS_DOCKER:
+        module.fail_json(
+            msg=(
+                "The 'docker' Python package is required by %s. "
+                "Install it (e.g. via the 'python3-docker' distro package) on the "
+                "target host. ImportError: %s"
+            )
+            % (module_name, DOCKER_IMPORT_ERROR)
+        )
+
+    try:
+        if docker_host:
+            tls_config = None
+            if tls_params:
+                tls_config = docker.tls.TLSConfig(**tls_params)
+            client = docker.DockerClient(base_url=docker_host, tls=tls_config, **client_kwargs)
+        else:
+            client = docker.from_env(**client_kwargs)
+        if ping:
+            client.ping()
+    except (DockerException, HTTPError) as exc:
+        module.fail_json(msg="Failed to connect to Docker daemon: %s" % exc)
+
+    return client
@@ -14,8 +14,21 @@ short_description: Report running containers for a Docker Compose project
 version_added: "0.1.5"
 description:
   - Query a Docker Compose project for its currently running containers.
-  - Uses C(docker compose ps --status running --format json) so only running
-    containers are returned (in line with the historical C(ps -q) behavior).
+  - With O(backend=cli), uses C(docker compose ps --status running --format json)
+    so only running containers are returned (in line with the historical
+    C(ps -q) behavior).
+  - With O(backend=engine), asks the Docker Engine API directly for running
+    containers carrying the C(com.docker.compose.project) label, without
+    forking the CLI or parsing the compose file. Any number of projects is
+    answered by the same single request (see O(project_names)). One-off
+    C(docker compose run) containers are left out, as C(ps) does.
+  - With O(wait_for), the module first waits until every container of the
+    project(s) is running (or healthy). It follows the daemon's event stream
+    and re-inspects a container only when an event names it, so it returns as
+    soon as the last container is ready instead of polling on a fixed delay.
+  - With O(collect_stats), every running container reported also carries a
+    one-shot resource sample, collected concurrently, and the samples are
+    summed per project.
   - Read-only -- safe in C(check_mode).
 options:
   project_directory:
@@ -23,14 +36,91 @@ options:
       - Absolute path to the directory containing the project's
         C(docker-compose.yml) (or equivalent compose file).
       - Must exist, must be an absolute path, must not contain C(..) segments.
-    required: true
+      - Required with O(backend=cli); ignored with O(backend=engine).
+    required: false
     type: path
   project_name:
     description:
       - Compose project name (passed as C(-p)).
       - Must match C(^[a-z0-9][a-z0-9_-]*$) (Compose project-name grammar).
-    required: true
+      - Exactly one of O(project_name) and O(project_names) is required.
+    required: false
     type: str
+  project_names:
+    description:
+      - Compose project names to check in one call. Requires O(backend=engine).
+      - Each name must match C(^[a-z0-9][a-z0-9_-]*$).
+    required: false
+    type: list
+    elements: str
+    version_added: "0.1.7"
+  backend:
+    description:
+      - How containers are looked up. C(cli) runs C(docker compose ps);
+        C(engine) queries the Docker Engine API through the Python Docker SDK.
+    required: false
+    type: str
+    choices: [cli, engine]
+    default: cli
+    version_added: "0.1.7"
+  wait_for:
+    description:
+      - Wait until every container of the project(s) reaches this state before
+        reporting. C(running) needs the container running and not restarting.
+        C(healthy) also needs its healthcheck to report C(healthy); a container
+        without a healthcheck counts as ready once it is running.
+      - The containers waited for are those present when the wait starts plus
+        any created during it. At least one container per project is required.
+      - Requires O(backend=engine). The module fails if the wait times out,
+        and still reports the per-container results.
+    required: false
+    type: str
+    choices: [running, healthy]
+    version_added: "0.1.7"
+  wait_timeout:
+    description:
+      - Seconds to wait for O(wait_for) before failing.
+    required: false
+    type: int
+    default: 300
+    version_added: "0.1.7"
+  collect_stats:
+    description:
+      - Add a C(stats) sample to each running container (CPU, memory, network
+        and block I/O, restart count, uptime, health) and per-project totals in
+        C(project_stats).
+      - Each sample is one C(/containers/{id}/stats?stream=false) request plus
+        one inspect. The daemon takes about a second per sample to measure CPU,
+        so samples are collected O(workers) at a time.
+      - Requires O(backend=engine).
+    required: false
+    type: bool
+    default: false
+    version_added: "0.1.7"
+  workers:
+    description:
+      - Maximum number of containers sampled at the same time with
+        O(collect_stats).
+    required: false
+    type: int
+    default: 8
+    version_added: "0.1.7"
+  docker_host:
+    description:
+      - Optional base URL for the Docker daemon (for example
+        C(unix:///var/run/docker.sock) or C(tcp://docker-host:2376)), used
+        with O(backend=engine).
+      - When omitted, the daemon is discovered from the environment.
+    required: false
+    type: str
+    version_added: "0.1.7"
+  tls:
+    description:
+      - Optional TLS configuration mapping passed straight to
+        C(docker.tls.TLSConfig), used with O(backend=engine).
+    required: false
+    type: dict
+    version_added: "0.1.7"
 author:
   - Saad Ali (@NIXKnight)
 '''
@@ -45,6 +135,43 @@ EXAMPLES = r'''
 - name: Show running container count
   ansible.builtin.debug:
     msg: "{{ pg_check.container_count }} container(s) running"
+
+- name: Check every compose project on the host with one Engine API request
+  nixknight.docker.docker_compose_service_check:
+    backend: engine
+    project_names:
+      - postgresql
+      - redis
+      - traefik
+  register: host_check
+
+- name: Wait for the project to become healthy after (re)starting it
+  nixknight.docker.docker_compose_service_check:
+    backend: engine
+    project_name: postgresql
+    wait_for: healthy
+    wait_timeout: 120
+  register: pg_ready
+
+- name: Show how long each container took to become healthy
+  ansible.builtin.debug:
+    msg: "{{ pg_ready.wait.containers | items2dict(key_name='name', value_name='ready_after') }}"
+
+- name: Sample resource usage of every project on the host
+  nixknight.docker.docker_compose_service_check:
+    backend: engine
+    project_names: "{{ compose_projects }}"
+    collect_stats: true
+  register: host_stats
+
+- name: Show memory used per project
+  ansible.builtin.debug:
+    msg: "{{ item.key }}: {{ item.value.memory_usage | human_readable }}"
+  loop: "{{ host_stats.project_stats | dict2items }}"
+
+- name: Show projects without running containers
+  ansible.builtin.debug:
+    msg: "{{ host_check.projects | dict2items | selectattr('value.container_count', 'eq', 0) | map(attribute='key') }}"
 '''
 
 RETURN = r'''
@@ -53,7 +180,9 @@ changed:
   type: bool
   returned: always
 containers:
-  description: List of running containers for the given project.
+  description:
+    - List of running containers for the given project.
+    - With O(project_names), the containers of all listed projects.
   type: list
   elements: dict
   returned: always
@@ -64,20 +193,176 @@ containers:
     name:
       description: Container name with any leading C(/) stripped.
       type: str
+    service:
+      description: Compose service the container belongs to.
+      type: str
+      returned: when O(backend=engine)
+      version_added: "0.1.7"
+    stats:
+      description:
+        - One-shot resource sample, or C(null) if the container went away
+          before it could be sampled or sampling it failed.
+      type: dict
+      returned: when O(collect_stats=true)
+      version_added: "0.1.7"
+      contains:
+        cpu_percent:
+          description:
+            - CPU usage over the sampling interval, computed as
+              C(docker stats) does (C(100) is one full CPU).
+          type: float
+        online_cpus:
+          description: CPUs available to the container.
+          type: int
+        memory_usage:
+          description: Memory used in bytes, excluding inactive page cache.
+          type: int
+        memory_limit:
+          description: Memory limit in bytes (host memory when unlimited).
+          type: int
+        memory_percent:
+          description: C(memory_usage) as a percentage of C(memory_limit).
+          type: float
+        network_rx_bytes:
+          description: Bytes received over all networks.
+          type: int
+        network_tx_bytes:
+          description: Bytes sent over all networks.
+          type: int
+        block_read_bytes:
+          description: Bytes read from block devices.
+          type: int
+        block_write_bytes:
+          description: Bytes written to block devices.
+          type: int
+        restart_count:
+          description: Times the daemon restarted the container.
+          type: int
+        uptime:
+          description: Seconds since the container was last started.
+          type: float
+        health:
+          description: Healthcheck status, or C(null) without a healthcheck.
+          type: str
+    stats_error:
+      description:
+        - Docker API error that kept this container from being sampled. The
+          container is left out of C(project_stats); the others are still
+          sampled.
+      type: str
+      returned: when O(collect_stats=true) and sampling the container failed
+      version_added: "0.1.7"
 container_count:
   description: Number of running containers reported.
   type: int
   returned: always
+projects:
+  description:
+    - Per-project results keyed by project name, each with its own
+      C(containers) and C(container_count).
+  type: dict
+  returned: when O(project_names) is set
+  sample:
+    postgresql:
+      containers: [{id: "4c01db0b339c...", name: "postgresql-db-1"}]
+      container_count: 1
+  version_added: "0.1.7"
+project_stats:
+  description:
+    - Per-project totals of the C(stats) samples, keyed by project name.
+      Sums of every numeric field except C(memory_limit), C(memory_percent)
+      and C(online_cpus), plus C(container_count) and C(unhealthy_count).
+  type: dict
+  returned: when O(collect_stats=true)
+  sample:
+    postgresql:
+      container_count: 1
+      unhealthy_count: 0
+      cpu_percent: 1.82
+      memory_usage: 73400320
+      network_rx_bytes: 1048576
+      network_tx_bytes: 524288
+      block_read_bytes: 4096
+      block_write_bytes: 81920
+      restart_count: 0
+  version_added: "0.1.7"
+wait:
+  description: Outcome of the O(wait_for) wait.
+  type: dict
+  returned: when O(wait_for) is set
+  version_added: "0.1.7"
+  contains:
+    ready:
+      description: Whether every container reached the requested state.
+      type: bool
+    elapsed:
+      description: Seconds spent waiting.
+      type: float
+    containers:
+      description: Per-container state at the end of the wait.
+      type: list
+      elements: dict
+      contains:
+        id:
+          description: Container ID.
+          type: str
+        name:
+          description: Container name with any leading C(/) stripped.
+          type: str
+        project:
+          description: Compose project of the container.
+          type: str
+        service:
+          description: Compose service of the container.
+          type: str
+        status:
+          description: Container status (C(created), C(running), C(exited), ...).
+          type: str
+        health:
+          description: Healthcheck status, or C(null) without a healthcheck.
+          type: str
+        ready_after:
+          description:
+            - Seconds from the start of the wait until the container became
+              ready; C(0) if it already was, C(null) if it never became ready.
+          type: float
 '''
 
 import json
 import os
 import pathlib
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from ansible.module_utils.basic import AnsibleModule
 
-
+try:
+    from docker.errors import APIError, NotFound
+except ImportError:
+    APIError = NotFound = Exception  # type: ignore[misc]
+
+from ansible_collections.nixknight.docker.plugins.module_utils.docker_common import (
+    DOCKER_CLIENT_ARGUMENT_SPEC,
+    HTTPError,
+    build_docker_client,
+    daemon_timestamp,
+)
+
+
+COMPOSE_PROJECT_LABEL = 'com.docker.compose.project'
+COMPOSE_SERVICE_LABEL = 'com.docker.compose.service'
+COMPOSE_ONEOFF_LABEL = 'com.docker.compose.oneoff'
+COMPOSE_LABEL_FILTER = [COMPOSE_PROJECT_LABEL, '%s=False' % COMPOSE_ONEOFF_LABEL]
+# Container events that can change whether a container is ready
+WAIT_EVENTS = ['create', 'start', 'restart', 'die', 'destroy', 'health_status']
+# Sample fields summed into the per-project totals
+PROJECT_STATS_FIELDS = (
+    'cpu_percent', 'memory_usage', 'network_rx_bytes', 'network_tx_bytes',
+    'block_read_bytes', 'block_write_bytes', 'restart_count',
+)
+STARTED_AT_RE = re.compile(r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$')
 PROJECT_NAME_RE = re.compile(r'^[a-z0-9][a-z0-9_-]*$')
 CONTAINER_ID_RE = re.compile(r'^[a-f0-9]{12,64}$')
 
@@ -201,34 +486,369 @@ def get_running_docker_containers(module, project_directory, project_name):
     return containers, None
 
 
+def get_running_project_containers(client, project_names):
+    """Return ({project: containers}, error_message) from the Engine API.
+
+    Label filters are ANDed by the daemon, so one request filters on the
+    project label key alone and the results are grouped by its value.
+    """
+    try:
+        listed = client.api.containers(filters={
+            'status': 'running',
+            'label': COMPOSE_LABEL_FILTER,
+        })
+    except (APIError, HTTPError, OSError) as exc:
+        return {}, "Docker API error while listing containers: %s" % exc
+
+    projects = dict((project_name, []) for project_name in project_names)
+    for entry in listed:
+        project_name = (entry.get('Labels') or {}).get(COMPOSE_PROJECT_LABEL)
+        if project_name not in projects:
+            continue
+        names = entry.get('Names') or []
+        projects[project_name].append({
+            "id": entry['Id'],
+            "name": (names[0] if names else "").lstrip("/"),
+            "service": entry['Labels'].get(COMPOSE_SERVICE_LABEL),
+        })
+
+    # Match the name ordering of `docker compose ps`
+    for containers in projects.values():
+        containers.sort(key=lambda container: container['name'])
+
+    return projects, None
+
+
+def _container_state(client, container_id):
+    """Inspect one container into the fields the wait reports, or None if gone."""
+    try:
+        details = client.api.inspect_container(container_id)
+    except NotFound:
+        return None
+    state = details.get('State') or {}
+    labels = (details.get('Config') or {}).get('Labels') or {}
+    return dict(
+        id=details['Id'],
+        name=(details.get('Name') or "").lstrip("/"),
+        project=labels.get(COMPOSE_PROJECT_LABEL),
+        service=labels.get(COMPOSE_SERVICE_LABEL),
+        status=state.get('Status'),
+        restarting=bool(state.get('Restarting')),
+        health=(state.get('Health') or {}).get('Status'),
+    )
+
+
+def _is_ready(container, wait_for):
+    """Whether an inspected container has reached the requested state."""
+    if container['status'] != 'running' or container['restarting']:
+        return False
+    if wait_for == 'healthy' and container['health'] is not None:
+        return container['health'] == 'healthy'
+    return True
+
+
+def wait_for_project_containers(client, project_names, wait_for, timeout):
+    """Wait until every container of the projects is ready; return the wait report.
+
+    The event subscription starts at the wait's start time, before the
+    containers are listed, so a change racing with the listing is replayed by
+    the daemon rather than missed. The stream ends on its own at the deadline.
+    """
+    started = time.time()
+    deadline = started + timeout
+    containers = {}
+    ready_after = {}
+
+    def track(container_id, at=None):
+        container = _container_state(client, container_id)
+        if container is None or container['project'] not in project_names:
+            containers.pop(container_id, None)
+            ready_after.pop(container_id, None)
+            return
+        containers[container_id] = container
+        if _is_ready(container, wait_for):
+            ready_after.setdefault(container_id, round(max(0.0, (at or time.time()) - started), 3))
+        else:
+            ready_after.pop(container_id, None)
+
+    def all_ready():
+        return (
+            all(any(c['project'] == project_name for c in containers.values()) for project_name in project_names)
+            and len(ready_after) == len(containers)
+        )
+
+    for entry in client.api.containers(all=True, filters={'label': COMPOSE_LABEL_FILTER}):
+        if (entry.get('Labels') or {}).get(COMPOSE_PROJECT_LABEL) in project_names:
+            track(entry['Id'])
+    for container_id in ready_after:
+        ready_after[container_id] = 0.0
+
+    if not all_ready():
+        events = client.api.events(
+            since=daemon_timestamp(started),
+            until=daemon_timestamp(deadline),
+            filters={'type': ['container'], 'event': WAIT_EVENTS, 'label': COMPOSE_LABEL_FILTER},
+            decode=True,
+        )
+        try:
+            for event in events:
+                actor = event.get('Actor') or {}
+                if (actor.get('Attributes') or {}).get(COMPOSE_PROJECT_LABEL) not in project_names:
+                    continue
+                # Time the readiness by the event, not by when it was read
+                track(actor.get('ID') or event.get('id'), (event.get('timeNano') or 0) / 1e9)
+                if all_ready():
+                    break
+        finally:
+            events.close()
+
+    report = []
+    for container_id, container in sorted(containers.items(), key=lambda item: item[1]['name']):
+        container = dict(container)
+        del container['restarting']
+        container['ready_after'] = ready_after.get(container_id)
+        report.append(container)
+
+    return dict(
+        ready=all_ready(),
+        elapsed=round(time.time() - started, 3),
+        containers=report,
+    )
+
+
+def _started_at(started_at):
+    """Parse the daemon's RFC 3339 C(StartedAt) (nanosecond precision) to a Unix time."""
+    match = STARTED_AT_RE.match(started_at or '')
+    if not match:
+        return None
+    seconds, fraction, zone = match.groups()
+    moment = datetime.strptime(seconds, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    if zone != 'Z':
+        offset = int(zone[1:3]) * 3600 + int(zone[4:6]) * 60
+        moment -= offset if zone[0] == '+' else -offset
+    return moment + float('0.' + (fraction or '0'))
+
+
+def _cpu_percent(stats):
+    """CPU usage between the two samples the daemon took, as `docker stats` computes it."""
+    cpu = stats.get('cpu_stats') or {}
+    precpu = stats.get('precpu_stats') or {}
+    cpu_delta = (cpu.get('cpu_usage') or {}).get('total_usage', 0) - (precpu.get('cpu_usage') or {}).get('total_usage', 0)
+    system_delta = cpu.get('system_cpu_usage', 0) - precpu.get('system_cpu_usage', 0)
+    online_cpus = cpu.get('online_cpus') or len((cpu.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0, online_cpus
+    return round(cpu_delta / system_delta * online_cpus * 100.0, 2), online_cpus
+
+
+def _memory_usage(stats):
+    """Memory in use minus inactive page cache (cgroup v2 and v1 key names)."""
+    memory = stats.get('memory_stats') or {}
+    detail = memory.get('stats') or {}
+    inactive = detail.get('inactive_file', detail.get('total_inactive_file', 0))
+    usage = memory.get('usage', 0)
+    return usage - inactive if inactive < usage else usage, memory.get('limit', 0)
+
+
+def _block_io(stats):
+    """Bytes read and written across all block devices."""
+    read_bytes = write_bytes = 0
+    for entry in (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []:
+        operation = (entry.get('op') or '').lower()
+        if operation == 'read':
+            read_bytes += entry.get('value', 0)
+        elif operation == 'write':
+            write_bytes += entry.get('value', 0)
+    return read_bytes, write_bytes
+
+
+def _container_stats(client, container_id):
+    """Return (sample, error_message) for one container; both None if it is gone."""
+    try:
+        details = client.api.inspect_container(container_id)
+        stats = client.api.stats(container_id, stream=False)
+    except NotFound:
+        return None, None
+    except (APIError, HTTPError, OSError) as exc:
+        return None, "Docker API error: %s" % exc
+
+    state = details.get('State') or {}
+    cpu_percent, online_cpus = _cpu_percent(stats)
+    memory_usage, memory_limit = _memory_usage(stats)
+    block_read_bytes, block_write_bytes = _block_io(stats)
+    networks = (stats.get('networks') or {}).values()
+    started_at = _started_at(state.get('StartedAt'))
+
+    return dict(
+        cpu_percent=cpu_percent,
+        online_cpus=online_cpus,
+        memory_usage=memory_usage,
+        memory_limit=memory_limit,
+        memory_percent=round(memory_usage / memory_limit * 100.0, 2) if memory_limit else 0.0,
+        network_rx_bytes=sum(network.get('rx_bytes', 0) for network in networks),
+        network_tx_bytes=sum(network.get('tx_bytes', 0) for network in networks),
+        block_read_bytes=block_read_bytes,
+        block_write_bytes=block_write_bytes,
+        restart_count=details.get('RestartCount', 0),
+        uptime=round(max(0.0, time.time() - started_at), 3) if started_at else None,
+        health=(state.get('Health') or {}).get('Status'),
+    ), None
+
+
+def collect_project_stats(client, projects, workers):
+    """Attach a C(stats) sample to every container and return per-project totals."""
+    containers = [container for project_containers in projects.values() for container in project_containers]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        samples = list(executor.map(lambda container: _container_stats(client, container['id']), containers))
+    for container, (sample, error) in zip(containers, samples):
+        container['stats'] = sample
+        if error:
+            container['stats_error'] = error
+
+    project_stats = {}
+    for project_name, project_containers in projects.items():
+        totals = dict((field, 0) for field in PROJECT_STATS_FIELDS)
+        totals.update(container_count=0, unhealthy_count=0)
+        for container in project_containers:
+            if container['stats'] is None:
+                continue
+            totals['container_count'] += 1
+            if container['stats']['health'] == 'unhealthy':
+                totals['unhealthy_count'] += 1
+            for field in PROJECT_STATS_FIELDS:
+                totals[field] += container['stats'][field]
+        totals['cpu_percent'] = round(totals['cpu_percent'], 2)
+        project_stats[project_name] = totals
+    return project_stats
+
+
 def main():
+    module_args = dict(
+        project_directory=dict(type='path', required=False, default=None),
+        project_name=dict(type='str', required=False, default=None),
+        project_names=dict(type='list', elements='str', required=False, default=None),
+        backend=dict(type='str', choices=['cli', 'engine'], default='cli'),
+        wait_for=dict(type='str', choices=['running', 'healthy'], required=False, default=None),
+        wait_timeout=dict(type='int', default=300),
+        collect_stats=dict(type='bool', default=False),
+        workers=dict(type='int', default=8),
+    )
+    module_args.update(DOCKER_CLIENT_ARGUMENT_SPEC)
+
     module = AnsibleModule(
-        argument_spec=dict(
-            project_directory=dict(type='path', required=True),
-            project_name=dict(type='str', required=True),
-        ),
+        argument_spec=module_args,
+        mutually_exclusive=[('project_name', 'project_names')],
+        required_one_of=[('project_name', 'project_names')],
+        required_if=[('backend', 'cli', ('project_directory',))],
         supports_check_mode=True,
     )
 
-    project_directory = _validate_project_directory(
-        module, module.params['project_directory']
-    )
-    project_name = _validate_project_name(
-        module, module.params['project_name']
-    )
+    if module.params['backend'] == 'cli':
+        if module.params['project_names'] is not None:
+            module.fail_json(msg="project_names requires backend=engine")
+        if module.params['wait_for'] is not None:
+            module.fail_json(msg="wait_for requires backend=engine")
+        if module.params['collect_stats']:
+            module.fail_json(msg="collect_stats requires backend=engine")
+
+        project_directory = _validate_project_directory(
+            module, module.params['project_directory']
+        )
+        project_name = _validate_project_name(
+            module, module.params['project_name']
+        )
+
+        containers, error = get_running_docker_containers(
+            module, project_directory, project_name
+        )
+
+        if error:
+            module.fail_json(msg="Error checking containers: %s" % error)
+
+        module.exit_json(
+            changed=False,
+            containers=containers,
+            container_count=len(containers),
+        )
 
-    containers, error = get_running_docker_containers(
-        module, project_directory, project_name
+    if module.params['project_names'] is not None:
+        project_names = list(dict.fromkeys(
+            _validate_project_name(module, project_name)
+            for project_name in module.params['project_names']
+        ))
+    else:
+        project_names = [_validate_project_name(module, module.params['project_name'])]
+
+    if module.params['wait_timeout'] < 1:
+        module.fail_json(msg="wait_timeout must be at least 1 second")
+    if module.params['workers'] < 1:
+        module.fail_json(msg="workers must be at least 1")
+
+    # The event stream may stay silent for the whole wait; keep the socket
+    # open a little longer than the deadline the daemon ends it at.
+    client = build_docker_client(
+        module,
+        'docker_compose_service_check',
+        module.params['docker_host'],
+        module.params['tls'],
+        ping=False,
+        timeout=module.params['wait_timeout'] + 30,
+        max_pool_size=module.params['workers'],
     )
 
+    wait = None
+    if module.params['wait_for'] is not None:
+        try:
+            wait = wait_for_project_containers(
+                client, project_names, module.params['wait_for'], module.params['wait_timeout']
+            )
+        except (APIError, HTTPError, OSError) as exc:
+            module.fail_json(msg="Error waiting for containers: Docker API error: %s" % exc)
+
+    projects, error = get_running_project_containers(client, project_names)
+
     if error:
         module.fail_json(msg="Error checking containers: %s" % error)
 
-    module.exit_json(
+    project_stats = None
+    if module.params['collect_stats']:
+        try:
+            project_stats = collect_project_stats(client, projects, module.params['workers'])
+        except (APIError, HTTPError, OSError) as exc:
+            module.fail_json(msg="Error collecting container stats: Docker API error: %s" % exc)
+
+    containers = [container for project_name in project_names for container in projects[project_name]]
+    result = dict(
         changed=False,
         containers=containers,
         container_count=len(containers),
     )
+    if module.params['project_names'] is not None:
+        result['projects'] = dict(
+            (project_name, dict(containers=projects[project_name], container_count=len(projects[project_name])))
+            for project_name in project_names
+        )
+    if project_stats is not None:
+        result['project_stats'] = project_stats
+
+    if wait is not None:
+        result['wait'] = wait
+        if not wait['ready']:
+            pending = [container['name'] for container in wait['containers'] if container['ready_after'] is None]
+            missing = [
+                project_name for project_name in project_names
+                if not any(container['project'] == project_name for container in wait['containers'])
+            ]
+            module.fail_json(
+                msg="Timed out after %d seconds waiting for containers to be %s: %s" % (
+                    module.params['wait_timeout'],
+                    module.params['wait_for'],
+                    ", ".join(pending + ["no containers in project %s" % project_name for project_name in missing]),
+                ),
+                **result
+            )
+
+    module.exit_json(**result)
 
 
 if __name__ == '__main__':
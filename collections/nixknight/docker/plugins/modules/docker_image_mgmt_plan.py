@@ -18,6 +18,18 @@ description:
     and images that may be safely removed.
   - Multi-tenant safe -- images referenced by any container on the daemon
     (including stopped containers) are protected from removal.
+  - The daemon is read once -- a single image listing and a single container
+    listing -- and the whole plan is computed from in-memory indexes, so the
+    number of API round-trips does not grow with the number of services,
+    images or containers.
+  - With O(inventory_cache_path), the inventory snapshot is kept on the
+    target host and brought up to date from the daemon's event log
+    (C(/events?since=)) instead of being re-read, so repeated runs against
+    the same daemon (create, check, cleanup in one play) only re-list images
+    or containers when something changed.
+  - With O(projects), a whole host (every compose project on it) is planned
+    in one invocation from the same inventory snapshot. An image desired by
+    any project is never scheduled for removal by another.
   - Supports C(check_mode); the inventory read still runs so the planner
     reports an accurate intended plan during dry-runs.
 options:
@@ -25,8 +37,20 @@ options:
     description:
       - Service-keyed mapping of desired images. Each value must contain
         C(name) and C(tag).
-    required: true
+      - Exactly one of O(images) and O(projects) is required.
+    required: false
+    type: dict
+  projects:
+    description:
+      - Project-keyed mapping for planning several compose projects at once.
+        Each value must contain C(images), a service-keyed mapping shaped like
+        O(images), and may set C(purge), C(force_refresh) and
+        C(resolve_digests) to override the module-level options for that
+        project.
+      - Exactly one of O(images) and O(projects) is required.
+    required: false
     type: dict
+    version_added: "0.1.7"
   purge:
     description:
       - When true, all existing tags of the desired image names are added to
@@ -44,6 +68,52 @@ options:
     required: false
     type: bool
     default: false
+  resolve_digests:
+    description:
+      - Only meaningful with O(force_refresh). When true, the registry's
+        manifest digest of each desired tag is resolved through the daemon's
+        distribution endpoint (one manifest request, no layer download) and
+        compared with the local image's C(RepoDigests). The image is scheduled
+        for a pull only when they differ or the tag is not present locally.
+      - If the registry cannot be queried, the image is scheduled for a pull
+        as with plain O(force_refresh).
+      - Registry credentials are read from the Docker client configuration of
+        the remote user.
+    required: false
+    type: bool
+    default: false
+    version_added: "0.1.7"
+  inventory_cache_path:
+    description:
+      - Path of a JSON file on the target host holding the last inventory
+        snapshot and the event cursor it is current up to, per daemon. When
+        unset, the inventory is always read afresh.
+      - On each run the daemon's events since the cursor are read. Image events
+        re-list images, and container create/destroy events re-list containers.
+        Anything else reuses the snapshot.
+      - Cursors and ages are taken from the daemon's clock (C(SystemTime) in
+        C(/info)), so the target's clock does not matter.
+      - The daemon only keeps its last 256 events, of all types, in memory.
+        When 256 events come back, the snapshot is rebuilt, and
+        O(inventory_cache_max_age) bounds how long a snapshot is trusted at all.
+      - The event log is lost when the daemon restarts. A snapshot is rebuilt
+        when the daemon C(ID) changes, or, for a daemon on a local socket,
+        when its process (from the C(docker.pid) file next to the socket)
+        changes. For a remote daemon a restart is only caught by
+        O(inventory_cache_max_age).
+      - The file is written (mode C(0600)) in check mode too; it is a cache,
+        not managed state.
+    required: false
+    type: path
+    version_added: "0.1.7"
+  inventory_cache_max_age:
+    description:
+      - Seconds after which a cached snapshot is discarded and the inventory is
+        read afresh, regardless of events.
+    required: false
+    type: int
+    default: 300
+    version_added: "0.1.7"
   docker_host:
     description:
       - Optional base URL for the Docker daemon (for example
@@ -83,6 +153,32 @@ EXAMPLES = r'''
         tag: "latest"
     force_refresh: true
   register: refresh_plan
+
+- name: Re-pull mutable tags only when the registry digest moved
+  nixknight.docker.docker_image_mgmt_plan:
+    images:
+      app:
+        name: "localhost:5000/foo/app"
+        tag: "latest"
+    force_refresh: true
+    resolve_digests: true
+  register: digest_plan
+
+- name: Plan every compose project on the host in one call
+  nixknight.docker.docker_image_mgmt_plan:
+    projects:
+      postgresql:
+        images:
+          postgresql:
+            name: "postgres"
+            tag: "16.2-bookworm"
+      legacy-app:
+        images:
+          app:
+            name: "registry.example.com:5000/foo/app"
+            tag: "1.4.2"
+        purge: true
+  register: host_plan
 '''
 
 RETURN = r'''
@@ -91,192 +187,367 @@ changed:
   type: bool
   returned: always
 docker_images_to_pull:
-  description: List of "name:tag" references that should be pulled.
+  description:
+    - List of "name:tag" references that should be pulled.
+    - With O(projects), the union over all projects.
   type: list
   elements: str
   returned: always
 docker_images_to_remove:
-  description: List of "name:tag" references that may be removed.
+  description:
+    - List of "name:tag" references that may be removed.
+    - With O(projects), the union over all projects.
   type: list
   elements: str
   returned: always
+docker_project_plans:
+  description:
+    - Per-project plans, keyed by project name, each with
+      C(docker_images_to_pull) and C(docker_images_to_remove).
+  type: dict
+  returned: when O(projects) is set
+  sample:
+    postgresql:
+      docker_images_to_pull: ["postgres:16.2-bookworm"]
+      docker_images_to_remove: ["postgres:16.1-bookworm"]
+  version_added: "0.1.7"
+docker_inventory_cache:
+  description:
+    - How the inventory snapshot was obtained. C(disabled) without
+      O(inventory_cache_path), C(miss) for a full read, C(refreshed) when
+      events forced part of it to be re-listed, C(hit) when the cached
+      snapshot was current.
+  type: str
+  returned: always
+  version_added: "0.1.7"
+docker_api_calls:
+  description: Number of Docker API round-trips made to compute the plan.
+  type: int
+  returned: always
+  sample: 3
+  version_added: "0.1.7"
 '''
 
+import calendar
+import json
+import os
 import re
+import tempfile
+import time
 
 from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.parsing.convert_bool import boolean
 
 try:
-    import docker
-    from docker.errors import APIError, DockerException, ImageNotFound
-    HAS_DOCKER = True
-    DOCKER_IMPORT_ERROR = None
-except ImportError as imp_exc:
-    HAS_DOCKER = False
-    DOCKER_IMPORT_ERROR = imp_exc
-
-try:
-    from urllib3.exceptions import HTTPError
+    from docker.errors import APIError, DockerException
 except ImportError:
-    HTTPError = Exception  # type: ignore[misc]
+    APIError = DockerException = Exception  # type: ignore[misc]
 
+from ansible_collections.nixknight.docker.plugins.module_utils.docker_common import (
+    DOCKER_CLIENT_ARGUMENT_SPEC,
+    build_docker_client,
+    normalize_repository,
+    sanitize_image_name,
+    sanitize_image_tag,
+    split_reference,
+)
 
-# Reject empty, NUL byte, ASCII control chars, and any whitespace inside the
-# reference. The Docker SDK itself enforces the remainder of the
-# distribution-spec grammar (incl. valid registry-host-with-port references
-# like `registry.example.com:5000/foo`).
-_BAD_IMAGE_CHARS = re.compile(r'[\x00-\x1f\s]')
 
+# The daemon keeps this many recent events, of all types, in memory for
+# `since` queries; a reply this long may have lost older events.
+DAEMON_EVENTS_BUFFER = 256
+INVENTORY_CACHE_VERSION = 2
 
-def _sanitize_image_name(module, image_name):
-    """Minimal sanitation: defer full validation to the Docker SDK."""
-    if not isinstance(image_name, str) or not image_name:
-        module.fail_json(msg="image name must be a non-empty string: %r" % (image_name,))
-    if _BAD_IMAGE_CHARS.search(image_name):
-        module.fail_json(
-            msg="image name contains control or whitespace characters: %r"
-            % (image_name,)
-        )
-    return image_name
+# SystemTime from /info, e.g. 2024-05-01T10:20:30.123456789Z
+DAEMON_TIME_RE = re.compile(r'^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$')
 
 
-def _sanitize_image_tag(module, image_tag):
-    """Minimal sanitation for the tag component."""
-    if not isinstance(image_tag, str) or not image_tag:
-        module.fail_json(msg="image tag must be a non-empty string: %r" % (image_tag,))
-    if _BAD_IMAGE_CHARS.search(image_tag):
-        module.fail_json(
-            msg="image tag contains control or whitespace characters: %r" % (image_tag,)
-        )
-    return image_tag
+def _list_images(client):
+    """Image fields the planner uses, from one C(/images/json) request."""
+    return [
+        dict(Id=image['Id'], RepoTags=image.get('RepoTags'), RepoDigests=image.get('RepoDigests'))
+        for image in client.api.images()
+    ]
 
 
-def _build_docker_client(module, docker_host, tls_params):
-    """Construct a DockerClient honoring optional docker_host / tls settings."""
-    if not HAS_DOCKER:
-        module.fail_json(
-            msg=(
-                "The 'docker' Python package is required by docker_image_mgmt_plan. "
-                "Install it (e.g. via the 'python3-docker' distro package) on the "
-                "target host. ImportError: %s"
-            )
-            % DOCKER_IMPORT_ERROR
-        )
+def _list_containers(client):
+    """Container fields the planner uses, from one C(/containers/json?all=1) request."""
+    return [
+        dict(Id=container['Id'], ImageID=container.get('ImageID'))
+        for container in client.api.containers(all=True)
+    ]
 
-    try:
-        if docker_host:
-            tls_config = None
-            if tls_params:
-                tls_config = docker.tls.TLSConfig(**tls_params)
-            client = docker.DockerClient(base_url=docker_host, tls=tls_config)
-        else:
-            client = docker.from_env()
-        client.ping()
-    except (DockerException, HTTPError) as exc:
-        module.fail_json(msg="Failed to connect to Docker daemon: %s" % exc)
 
-    return client
+def _load_inventory_cache(path):
+    """Read the cache file; a missing or unreadable file is an empty cache."""
+    try:
+        with open(path) as f:
+            store = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(store, dict) or store.get('version') != INVENTORY_CACHE_VERSION:
+        return {}
+    return store
+
+
+def _save_inventory_cache(path, store):
+    """Write the cache file atomically, readable by its owner only."""
+    directory = os.path.dirname(path) or '.'
+    if not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.docker-inventory-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(store, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
 
 
-def _protected_image_references(client):
-    """Return the set of image references currently in use by any container.
+def _daemon_time(info):
+    """The daemon's clock from C(/info) as (Unix time, C(since)/C(until) cursor).
 
-    Multi-tenant safety: filters against C(client.containers.list(all=True))
-    so containers in created/running/paused/exited states are all considered.
-    The protection set is derived from each container's image ID plus its
-    current tags -- this catches both tag-referenced and digest-referenced
-    deployments on the same daemon.
+    The cursor is built from the reported digits, so it keeps the daemon's
+    nanosecond precision.
+    """
+    match = DAEMON_TIME_RE.match(info.get('SystemTime') or '')
+    if match is None:
+        raise RuntimeError("Docker daemon reported an unreadable SystemTime: %r" % info.get('SystemTime'))
+    seconds = calendar.timegm(time.strptime(match.group(1), '%Y-%m-%dT%H:%M:%S'))
+    if match.group(3) != 'Z':
+        offset = int(match.group(3)[1:3]) * 3600 + int(match.group(3)[4:6]) * 60
+        seconds -= offset if match.group(3)[0] == '+' else -offset
+    nanoseconds = ((match.group(2) or '') + '0' * 9)[:9]
+    return seconds + int(nanoseconds) / 1e9, '%d.%s' % (seconds, nanoseconds)
+
+
+def _daemon_process(client):
+    """Identify the running daemon process when it listens on a local socket.
+
+    The daemon ID survives restarts but the event log does not, so a restart
+    has to be told apart by the process itself: its pid from the C(docker.pid)
+    file next to the socket, with the boot ID and the process start time from
+    C(/proc). Returns None when that cannot be read, e.g. for a remote daemon.
+    """
+    if client.api.base_url != 'http+docker://localhost':
+        return None
+    socket_path = getattr(client.api.get_adapter(client.api.base_url), 'socket_path', None)
+    if not socket_path:
+        return None
+    try:
+        with open(os.path.join(os.path.dirname(socket_path), 'docker.pid')) as f:
+            pid = int(f.read().strip())
+        with open('/proc/%d/stat' % pid) as f:
+            stat = f.read()
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            boot_id = f.read().strip()
+    except (IOError, OSError, ValueError):
+        return None
+    # starttime is field 22; count from after the parenthesised command name
+    return '%s:%d:%s' % (boot_id, pid, stat.rpartition(')')[2].split()[19])
+
+
+def _cached_daemon_snapshot(client, inventory_cache):
+    """Return (images, containers, api_calls, status) using the on-host cache.
+
+    Cursors are read from the daemon's own clock before the daemon is read, so
+    an event racing with the read is seen again next time rather than missed,
+    whatever the target's clock says. A snapshot from another daemon, or from
+    an earlier run of this one, is discarded, as is one whose events no longer
+    fit in the daemon's event buffer.
+    """
+    store = _load_inventory_cache(inventory_cache['path'])
+    entries = store.setdefault('daemons', {})
+    entry = entries.get(inventory_cache['key'])
+
+    info = client.api.info()
+    api_calls = 1
+    now, cursor = _daemon_time(info)
+    daemon = dict(id=info.get('ID'), process=_daemon_process(client))
+
+    if entry and entry.get('daemon') == daemon and 0 <= now - entry.get('created', 0) <= inventory_cache['max_age']:
+        # Unfiltered, so the count is comparable with the daemon's buffer, which
+        # holds events of every type
+        events = list(client.api.events(
+            since=entry['cursor'],
+            until=cursor,
+            decode=True,
+        ))
+        api_calls += 1
+
+        if len(events) < DAEMON_EVENTS_BUFFER:
+            status = 'hit'
+            if any(event.get('Type') == 'image' for event in events):
+                entry['images'] = _list_images(client)
+                api_calls += 1
+                status = 'refreshed'
+            if any(event.get('Type') == 'container' and event.get('Action') in ('create', 'destroy')
+                   for event in events):
+                entry['containers'] = _list_containers(client)
+                api_calls += 1
+                status = 'refreshed'
+            entry['cursor'] = cursor
+            _save_inventory_cache(inventory_cache['path'], store)
+            return entry['images'], entry['containers'], api_calls, status
+
+    entry = dict(cursor=cursor, created=now, daemon=daemon)
+    entry['images'] = _list_images(client)
+    entry['containers'] = _list_containers(client)
+    api_calls += 2
+    entries[inventory_cache['key']] = entry
+    store['version'] = INVENTORY_CACHE_VERSION
+    _save_inventory_cache(inventory_cache['path'], store)
+    return entry['images'], entry['containers'], api_calls, 'miss'
+
+
+def _daemon_inventory(client, inventory_cache=None):
+    """Snapshot the daemon's images and containers and index them.
+
+    One C(/images/json) and one C(/containers/json?all=1) request replace the
+    per-service image listings, per-candidate image inspections and
+    per-container image lookups. Containers in created/running/paused/exited
+    states are all listed, and their image IDs are the protection set -- this
+    covers both tag-referenced and digest-referenced deployments on the same
+    daemon. With C(inventory_cache), the snapshot comes from the on-host cache
+    and the daemon's event log instead.
     """
-    protected_tags = set()
-    protected_ids = set()
-    for container in client.containers.list(all=True):
-        image = getattr(container, "image", None)
-        if image is None:
-            continue
-        if getattr(image, "id", None):
-            protected_ids.add(image.id)
-        for tag in getattr(image, "tags", []) or []:
-            protected_tags.add(tag)
-    return protected_tags, protected_ids
-
-
-def _existing_tags_for_image(client, image_name):
-    """List all locally present tags for the given image name."""
     try:
-        images = client.images.list(name=image_name)
+        if inventory_cache:
+            images, containers, api_calls, cache_status = _cached_daemon_snapshot(client, inventory_cache)
+        else:
+            images, containers, api_calls, cache_status = _list_images(client), _list_containers(client), 2, 'disabled'
     except APIError as exc:
-        raise RuntimeError("Docker API error while listing %s: %s" % (image_name, exc))
+        raise RuntimeError("Docker API error while reading the daemon inventory: %s" % exc)
 
-    tags = []
+    tag_to_id = {}
+    repository_to_tags = {}
+    id_to_digests = {}
     for image in images:
-        for tag in image.tags or []:
-            tags.append(tag)
-    return tags
-
+        id_to_digests[image['Id']] = set(
+            (normalize_repository(repository), digest)
+            for repository, _sep, digest in (
+                repo_digest.partition('@') for repo_digest in image.get('RepoDigests') or []
+            )
+        )
+        for reference in image.get('RepoTags') or []:
+            if reference == '<none>:<none>':
+                continue
+            tag_to_id[reference] = image['Id']
+            repository, _tag = split_reference(reference)
+            repository_to_tags.setdefault(normalize_repository(repository), []).append(reference)
+
+    in_use_ids = set()
+    for container in containers:
+        if container.get('ImageID'):
+            in_use_ids.add(container['ImageID'])
+
+    return dict(
+        tag_to_id=tag_to_id,
+        repository_to_tags=repository_to_tags,
+        id_to_digests=id_to_digests,
+        in_use_ids=in_use_ids,
+        api_calls=api_calls,
+        cache_status=cache_status,
+    )
 
-def get_docker_image_management_plan(module, client, images_config, purge, force_refresh):
-    """Compute the pull / remove plan honoring multi-tenant protections."""
-    images_to_pull = []
-    images_to_remove = []
 
-    protected_tags, protected_ids = _protected_image_references(client)
+def _desired_images(module, images_config, label):
+    """Validate a service-keyed images mapping into (name, tag) pairs."""
+    if not isinstance(images_config, dict):
+        module.fail_json(msg="%s must be a mapping of services to images" % label)
 
+    desired = []
     for service, config in images_config.items():
         if not isinstance(config, dict):
             module.fail_json(
-                msg="images[%s] must be a mapping with 'name' and 'tag' keys" % service
+                msg="%s[%s] must be a mapping with 'name' and 'tag' keys" % (label, service)
             )
 
-        image_name = _sanitize_image_name(module, config.get('name', ''))
-        image_tag = _sanitize_image_tag(module, config.get('tag', ''))
+        image_name = sanitize_image_name(module, config.get('name', ''))
+        image_tag = sanitize_image_tag(module, config.get('tag', ''))
+        desired.append((image_name, image_tag))
+    return desired
+
+
+def _desired_references(desired_images):
+    """Return the set of desired references in the daemon's spelling."""
+    return set(
+        "%s:%s" % (normalize_repository(image_name), image_tag)
+        for image_name, image_tag in desired_images
+    )
+
+
+def _registry_digest_matches(client, inventory, image, image_id):
+    """Whether the registry still serves the manifest the local image came from.
+
+    Any failure to resolve the remote digest counts as a mismatch, so the
+    image falls back to being pulled.
+    """
+    inventory['api_calls'] += 1
+    try:
+        remote_digest = client.api.inspect_distribution(image)['Descriptor']['digest']
+    except (APIError, DockerException, KeyError, TypeError):
+        return False
+
+    repository, _tag = split_reference(image)
+    return (normalize_repository(repository), remote_digest) in inventory['id_to_digests'].get(image_id, ())
+
+
+def _plan_images(client, inventory, desired_images, purge, force_refresh, resolve_digests, keep_references):
+    """Compute one pull / remove plan from the inventory snapshot.
+
+    Tags in C(keep_references) are never scheduled for removal; they are the
+    images other services and projects on the host still want.
+    """
+    images_to_pull = []
+    images_to_remove = []
+
+    for image_name, image_tag in desired_images:
         required_image = "%s:%s" % (image_name, image_tag)
+        # Compare in the daemon's spelling so docker.io/library/x:tag matches x:tag
+        required_reference = "%s:%s" % (normalize_repository(image_name), image_tag)
 
-        try:
-            existing_images = _existing_tags_for_image(client, image_name)
+        existing_images = inventory['repository_to_tags'].get(
+            normalize_repository(image_name), []
+        )
 
-            if force_refresh:
-                # R9: always schedule a pull so the resulting `changed`
-                # propagates to the restart handler.
+        if force_refresh:
+            # R9: always schedule a pull so the resulting `changed`
+            # propagates to the restart handler -- unless the registry digest
+            # shows the local copy of the tag is already current.
+            image_id = inventory['tag_to_id'].get(required_reference)
+            if not (resolve_digests and image_id and
+                    _registry_digest_matches(client, inventory, required_image, image_id)):
                 images_to_pull.append(required_image)
 
-            if required_image not in existing_images:
-                if not force_refresh:
-                    images_to_pull.append(required_image)
-                # Removal candidates: all other tags of this image name that
-                # are not protected by an active container reference.
-                images_to_remove.extend([
-                    img for img in existing_images if img != required_image
-                ])
-            elif purge:
-                # During purge, every tag of this image name is a removal
-                # candidate (still subject to the protection filter below).
-                images_to_remove.extend(existing_images)
-            else:
-                # Required tag present: candidates are sibling tags only.
-                images_to_remove.extend([
-                    img for img in existing_images if img != required_image
-                ])
-
-        except ImageNotFound:
-            images_to_pull.append(required_image)
-        except RuntimeError as exc:
-            module.fail_json(msg=str(exc))
-        except Exception as exc:  # pylint: disable=broad-except
-            module.fail_json(msg="Error checking image %s: %s" % (image_name, exc))
+        if required_reference not in existing_images:
+            if not force_refresh:
+                images_to_pull.append(required_image)
+            # Removal candidates: all other tags of this image name that
+            # are not protected by an active container reference.
+            images_to_remove.extend([
+                img for img in existing_images if img != required_reference
+            ])
+        elif purge:
+            # During purge, every tag of this image name is a removal
+            # candidate (still subject to the protection filter below).
+            images_to_remove.extend(existing_images)
+        else:
+            # Required tag present: candidates are sibling tags only.
+            images_to_remove.extend([
+                img for img in existing_images if img != required_reference
+            ])
 
     # Multi-tenant safety filter (S2): drop any candidate that is in use by
-    # any container on this daemon (any project, any state).
+    # any container on this daemon (any project, any state), or that is
+    # still desired elsewhere. Every tag of an in-use image ID is protected,
+    # so checking the ID covers both the tag and the digest reference cases.
     filtered_remove = []
     for tag in images_to_remove:
-        if tag in protected_tags:
+        if tag in keep_references:
             continue
-        # Resolve to the image object so we can check its ID; if the tag is
-        # gone before we get here we simply skip it.
-        try:
-            img = client.images.get(tag)
-        except (ImageNotFound, APIError):
-            continue
-        if getattr(img, "id", None) in protected_ids:
+        if inventory['tag_to_id'].get(tag) in inventory['in_use_ids']:
             continue
         filtered_remove.append(tag)
 
@@ -286,48 +557,146 @@ def get_docker_image_management_plan(module, client, images_config, purge, force
     return images_to_pull, images_to_remove
 
 
+def get_docker_image_management_plan(module, client, images_config, purge, force_refresh, resolve_digests=False, inventory_cache=None):
+    """Compute the pull / remove plan honoring multi-tenant protections."""
+    inventory = _daemon_inventory(client, inventory_cache)
+    desired_images = _desired_images(module, images_config, 'images')
+
+    # Outside of a purge, no service's image is removed as a sibling tag of
+    # another service's image.
+    keep_references = set() if purge else _desired_references(desired_images)
+
+    images_to_pull, images_to_remove = _plan_images(
+        client, inventory, desired_images, purge, force_refresh, resolve_digests, keep_references
+    )
+    return images_to_pull, images_to_remove, inventory
+
+
+def get_docker_image_management_plans(module, client, projects_config, purge, force_refresh, resolve_digests=False, inventory_cache=None):
+    """Compute per-project plans for a whole host from one inventory snapshot."""
+    inventory = _daemon_inventory(client, inventory_cache)
+
+    projects = []
+    for project, config in projects_config.items():
+        if not isinstance(config, dict) or 'images' not in config:
+            module.fail_json(msg="projects[%s] must be a mapping with an 'images' key" % project)
+        projects.append((
+            project,
+            _desired_images(module, config['images'], "projects[%s].images" % project),
+            boolean(config.get('purge', purge)),
+            boolean(config.get('force_refresh', force_refresh)),
+            boolean(config.get('resolve_digests', resolve_digests)),
+        ))
+
+    desired_by_project = dict(
+        (project, _desired_references(desired_images))
+        for project, desired_images, _purge, _force_refresh, _resolve_digests in projects
+    )
+
+    project_plans = {}
+    for project, desired_images, project_purge, project_force_refresh, project_resolve_digests in projects:
+        # Images any other project wants are kept; a project's own images are
+        # kept too unless it is being purged.
+        keep_references = set()
+        for other_project, references in desired_by_project.items():
+            if other_project != project or not project_purge:
+                keep_references.update(references)
+
+        images_to_pull, images_to_remove = _plan_images(
+            client, inventory, desired_images, project_purge, project_force_refresh,
+            project_resolve_digests, keep_references
+        )
+        project_plans[project] = dict(
+            docker_images_to_pull=images_to_pull,
+            docker_images_to_remove=images_to_remove,
+        )
+
+    return project_plans, inventory
+
+
 def main():
     module_args = dict(
-        images=dict(type='dict', required=True),
+        images=dict(type='dict', required=False, default=None),
+        projects=dict(type='dict', required=False, default=None),
         purge=dict(type='bool', default=False),
         force_refresh=dict(type='bool', default=False),
-        docker_host=dict(type='str', required=False, default=None),
-        tls=dict(type='dict', required=False, default=None, no_log=False),
+        resolve_digests=dict(type='bool', default=False),
+        inventory_cache_path=dict(type='path', required=False, default=None),
+        inventory_cache_max_age=dict(type='int', default=300),
     )
+    module_args.update(DOCKER_CLIENT_ARGUMENT_SPEC)
 
     result = dict(
         changed=False,
         docker_images_to_pull=[],
         docker_images_to_remove=[],
+        docker_api_calls=0,
+        docker_inventory_cache='disabled',
     )
 
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('images', 'projects')],
+        required_one_of=[('images', 'projects')],
         supports_check_mode=True,
     )
 
+    inventory_cache = None
+    if module.params['inventory_cache_path']:
+        inventory_cache = dict(
+            path=module.params['inventory_cache_path'],
+            max_age=module.params['inventory_cache_max_age'],
+            key=module.params['docker_host'] or 'default',
+        )
+
     # S4: the read-only inventory must still run in --check mode so the planner
     # reports accurate drift; the pull/remove tasks (in the role) are the
-    # only things that should be skipped.
-    client = _build_docker_client(
+    # only things that should be skipped. With the inventory cache, the
+    # /info request for the daemon's clock doubles as the connection check.
+    client = build_docker_client(
         module,
+        'docker_image_mgmt_plan',
         module.params['docker_host'],
         module.params['tls'],
+        ping=inventory_cache is None,
     )
 
     try:
-        images_to_pull, images_to_remove = get_docker_image_management_plan(
-            module,
-            client,
-            module.params['images'],
-            module.params['purge'],
-            module.params['force_refresh'],
-        )
+        if module.params['projects'] is not None:
+            project_plans, inventory = get_docker_image_management_plans(
+                module,
+                client,
+                module.params['projects'],
+                module.params['purge'],
+                module.params['force_refresh'],
+                module.params['resolve_digests'],
+                inventory_cache,
+            )
+            images_to_pull = list(dict.fromkeys(
+                image for plan in project_plans.values() for image in plan['docker_images_to_pull']
+            ))
+            images_to_remove = list(dict.fromkeys(
+                image for plan in project_plans.values() for image in plan['docker_images_to_remove']
+            ))
+            result['docker_project_plans'] = project_plans
+        else:
+            images_to_pull, images_to_remove, inventory = get_docker_image_management_plan(
+                module,
+                client,
+                module.params['images'],
+                module.params['purge'],
+                module.params['force_refresh'],
+                module.params['resolve_digests'],
+                inventory_cache,
+            )
     except Exception as exc:  # pylint: disable=broad-except
         module.fail_json(msg=str(exc))
 
     result['docker_images_to_pull'] = images_to_pull
     result['docker_images_to_remove'] = images_to_remove
+    # The connection check in build_docker_client is one round-trip as well
+    result['docker_api_calls'] = inventory['api_calls'] + (0 if inventory_cache else 1)
+    result['docker_inventory_cache'] = inventory['cache_status']
 
     module.exit_json(**result)
 
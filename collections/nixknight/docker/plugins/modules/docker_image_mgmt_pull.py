@@ -0,0 +1,319 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: docker_image_mgmt_pull
+short_description: Pull the images planned by docker_image_mgmt_plan in parallel
+version_added: "0.1.7"
+description:
+  - Pull a list of image references concurrently through a single Docker
+    client, with a bounded number of workers and a per-image timeout.
+  - Companion to M(nixknight.docker.docker_image_mgmt_plan); feed it the
+    planner's C(docker_images_to_pull) list.
+  - Every listed image is pulled, even if the reference is already present
+    locally, so mutable tags are refreshed. An image is reported as
+    C(changed) only when the pull moved its reference to a different image ID.
+  - Registry credentials are read from the Docker client configuration of
+    the remote user (for example after C(community.docker.docker_login)).
+  - Supports C(check_mode); nothing is pulled and every image is reported as
+    C(changed).
+options:
+  images:
+    description:
+      - Image references (C(name:tag) or C(name@digest)) to pull. A bare
+        C(name) pulls C(name:latest), not every tag.
+    required: true
+    type: list
+    elements: str
+  workers:
+    description:
+      - Maximum number of images pulled at the same time.
+    required: false
+    type: int
+    default: 4
+  timeout:
+    description:
+      - Seconds each image pull may take before it is abandoned and reported
+        as timed out.
+      - A pull whose progress stream goes silent for this long is cut off by
+        the socket timeout. A pull that keeps reporting progress is abandoned
+        at the first progress event after the deadline, so it can overrun by
+        at most one more C(timeout) of silence. The connection to the daemon
+        is closed in both cases.
+    required: false
+    type: int
+    default: 600
+  docker_host:
+    description:
+      - Optional base URL for the Docker daemon (for example
+        C(unix:///var/run/docker.sock) or C(tcp://docker-host:2376)).
+      - When omitted, the daemon is discovered from the environment.
+    required: false
+    type: str
+  tls:
+    description:
+      - Optional TLS configuration mapping passed straight to
+        C(docker.tls.TLSConfig).
+    required: false
+    type: dict
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Plan image lifecycle for a service
+  nixknight.docker.docker_image_mgmt_plan:
+    images:
+      postgresql:
+        name: "postgres"
+        tag: "16.2-bookworm"
+      redis:
+        name: "redis"
+        tag: "7.2.4-bookworm"
+  register: plan
+
+- name: Pull the planned images, four at a time
+  nixknight.docker.docker_image_mgmt_pull:
+    images: "{{ plan.docker_images_to_pull }}"
+    workers: 4
+    timeout: 900
+  register: pulled
+'''
+
+RETURN = r'''
+changed:
+  description: Whether any pull moved an image reference to a new image ID.
+  type: bool
+  returned: always
+images:
+  description: Per-image results, in the order the images were given.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    image:
+      description: The image reference that was pulled.
+      type: str
+    changed:
+      description: Whether the reference now points at a different image ID.
+      type: bool
+    duration:
+      description: Seconds spent pulling this image.
+      type: float
+    id:
+      description: Image ID the reference points at after the pull.
+      type: str
+    previous_id:
+      description: Image ID the reference pointed at before the pull, if any.
+      type: str
+    failed:
+      description: Whether the pull of this image failed.
+      type: bool
+    timed_out:
+      description: Whether the pull failed because it ran past O(timeout).
+      type: bool
+    msg:
+      description: Error message for a failed pull.
+      type: str
+      returned: when failed
+duration:
+  description: Seconds spent pulling all images.
+  type: float
+  returned: always
+'''
+
+import json
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+
+try:
+    from docker import auth
+    from docker.errors import APIError, DockerException, ImageNotFound, create_api_error_from_http_exception
+except ImportError:
+    APIError = DockerException = ImageNotFound = Exception  # type: ignore[misc]
+
+try:
+    from requests.exceptions import HTTPError as RequestHTTPError, Timeout as RequestTimeout
+    from urllib3.exceptions import TimeoutError as HTTPTimeoutError
+except ImportError:
+    RequestHTTPError = RequestTimeout = HTTPTimeoutError = Exception  # type: ignore[misc]
+
+from ansible_collections.nixknight.docker.plugins.module_utils.docker_common import (
+    BAD_IMAGE_CHARS,
+    DOCKER_CLIENT_ARGUMENT_SPEC,
+    HTTPError,
+    build_docker_client,
+    split_reference,
+)
+
+
+def _image_id(client, image):
+    """Return the local image ID of a reference, or None if it is absent."""
+    try:
+        return client.api.inspect_image(image)['Id']
+    except ImageNotFound:
+        return None
+
+
+def _pull_arguments(image):
+    """Return (repository, tag) for APIClient.pull.
+
+    Without a tag the pull API fetches every tag of the repository, so an
+    untagged reference gets C(latest), as C(docker pull) does. A digest is
+    passed as the tag.
+    """
+    repository, sep, digest = image.partition('@')
+    if sep:
+        return repository, digest
+    repository, tag = split_reference(image)
+    return repository, tag or 'latest'
+
+
+def _is_timeout(exc):
+    """Whether a pull failed on its deadline or on the socket timeout."""
+    if isinstance(exc, (socket.timeout, TimeoutError, RequestTimeout, HTTPTimeoutError)):
+        return True
+    # requests reports a read timeout in the middle of a stream as a
+    # ConnectionError wrapping urllib3's
+    return bool(exc.args) and isinstance(exc.args[0], HTTPTimeoutError)
+
+
+def _wait_for_pull(client, image, timeout):
+    """Pull `image`, consuming its progress stream for at most `timeout` seconds.
+
+    APIClient.pull() streams without a socket timeout, so the request is made
+    here through the client's session with one: a read that stalls for
+    `timeout` seconds aborts. The deadline is checked between progress events
+    as well, so a pull that keeps reporting progress is abandoned too. Either
+    way the connection to the daemon is closed.
+    """
+    deadline = time.monotonic() + timeout
+    repository, tag = _pull_arguments(image)
+    registry, _name = auth.resolve_repository_name(repository)
+    headers = {}
+    auth_header = auth.get_config_header(client.api, registry)
+    if auth_header:
+        headers['X-Registry-Auth'] = auth_header
+
+    response = client.api.post(
+        '%s/v%s/images/create' % (client.api.base_url, client.api.api_version),
+        params=dict(fromImage=repository, tag=tag),
+        headers=headers,
+        stream=True,
+        timeout=timeout,
+    )
+    try:
+        try:
+            response.raise_for_status()
+        except RequestHTTPError as exc:
+            create_api_error_from_http_exception(exc)
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event.get('error'):
+                raise APIError(event['error'])
+            if time.monotonic() > deadline:
+                raise TimeoutError("pull did not complete within %d seconds" % timeout)
+    finally:
+        response.close()
+
+
+def _pull_image(client, image, timeout):
+    """Pull one image and report whether its local image ID changed."""
+    started = time.monotonic()
+    result = dict(image=image, changed=False, failed=False, timed_out=False, id=None, previous_id=None)
+
+    try:
+        result['previous_id'] = _image_id(client, image)
+        _wait_for_pull(client, image, timeout)
+        result['id'] = _image_id(client, image)
+        result['changed'] = result['id'] != result['previous_id']
+    except (APIError, DockerException, HTTPError, OSError, ValueError) as exc:
+        result['failed'] = True
+        if _is_timeout(exc):
+            result['timed_out'] = True
+            result['msg'] = "Timed out pulling %s: the pull did not complete within %d seconds" % (image, timeout)
+        else:
+            result['msg'] = "Failed to pull %s: %s" % (image, exc)
+
+    result['duration'] = round(time.monotonic() - started, 3)
+    return result
+
+
+def pull_images(client, images, workers, timeout):
+    """Pull every image with at most `workers` pulls in flight."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda image: _pull_image(client, image, timeout), images))
+
+
+def main():
+    module_args = dict(
+        images=dict(type='list', elements='str', required=True),
+        workers=dict(type='int', default=4),
+        timeout=dict(type='int', default=600),
+    )
+    module_args.update(DOCKER_CLIENT_ARGUMENT_SPEC)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+
+    images = list(dict.fromkeys(module.params['images']))
+    for image in images:
+        if not image or BAD_IMAGE_CHARS.search(image):
+            module.fail_json(msg="image reference is empty or contains control or whitespace characters: %r" % (image,))
+    if module.params['workers'] < 1:
+        module.fail_json(msg="workers must be at least 1")
+    if module.params['timeout'] < 1:
+        module.fail_json(msg="timeout must be at least 1 second")
+
+    result = dict(changed=False, images=[], duration=0.0)
+    if not images:
+        module.exit_json(**result)
+
+    if module.check_mode:
+        result['changed'] = True
+        result['images'] = [
+            dict(image=image, changed=True, failed=False, timed_out=False, id=None, previous_id=None, duration=0.0)
+            for image in images
+        ]
+        module.exit_json(**result)
+
+    workers = min(module.params['workers'], len(images))
+    # One connection per worker, and the per-image timeout for the inspect
+    # requests as well as for the pulls themselves.
+    client = build_docker_client(
+        module,
+        'docker_image_mgmt_pull',
+        module.params['docker_host'],
+        module.params['tls'],
+        timeout=module.params['timeout'],
+        max_pool_size=workers,
+    )
+
+    started = time.monotonic()
+    result['images'] = pull_images(client, images, workers, module.params['timeout'])
+    result['duration'] = round(time.monotonic() - started, 3)
+    result['changed'] = any(image['changed'] for image in result['images'])
+
+    failed = [image['msg'] for image in result['images'] if image['failed']]
+    if failed:
+        module.fail_json(msg="; ".join(failed), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: docker_image_mgmt_remove
+short_description: Remove the images planned by docker_image_mgmt_plan in one batch
+version_added: "0.1.7"
+description:
+  - Remove a list of image references concurrently through a single Docker
+    client and report how much disk space each removal freed.
+  - Companion to M(nixknight.docker.docker_image_mgmt_plan); feed it the
+    planner's C(docker_images_to_remove) list.
+  - Removing a reference only untags the image while other tags still point
+    at it; the image and its unique layers are deleted with its last tag.
+  - Image sizes are read once from the daemon's disk-usage report
+    (C(/system/df)) before the batch. The reclaimed space of an image is its
+    unique (unshared) size, counted only for images that were actually
+    deleted. The report also sizes containers and volumes, which can take a
+    while on a daemon with large volumes. If the daemon cannot produce it,
+    the plain image list is used and the whole image size is counted.
+  - References that are already absent are skipped. A reference still in use
+    by a container fails the run; the daemon refuses to delete it.
+  - Supports C(check_mode); nothing is removed and the reported sizes are
+    estimates for the images that would be deleted.
+options:
+  images:
+    description:
+      - Image references (C(name:tag)) to remove.
+    required: true
+    type: list
+    elements: str
+  workers:
+    description:
+      - Maximum number of removals in flight at the same time.
+    required: false
+    type: int
+    default: 4
+  prune_dangling:
+    description:
+      - Also prune dangling (untagged, unused) images once the listed
+        references are removed. This is daemon-wide, not limited to the listed
+        images.
+    required: false
+    type: bool
+    default: false
+  docker_host:
+    description:
+      - Optional base URL for the Docker daemon (for example
+        C(unix:///var/run/docker.sock) or C(tcp://docker-host:2376)).
+      - When omitted, the daemon is discovered from the environment.
+    required: false
+    type: str
+  tls:
+    description:
+      - Optional TLS configuration mapping passed straight to
+        C(docker.tls.TLSConfig).
+    required: false
+    type: dict
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Remove the images the planner marked as stale
+  nixknight.docker.docker_image_mgmt_remove:
+    images: "{{ plan.docker_images_to_remove }}"
+    prune_dangling: true
+  register: removed
+
+- name: Report reclaimed disk space
+  ansible.builtin.debug:
+    msg: "Freed {{ removed.reclaimed_bytes | human_readable }}"
+'''
+
+RETURN = r'''
+changed:
+  description: Whether any reference was removed or any dangling image pruned.
+  type: bool
+  returned: always
+images:
+  description: Per-image results, in the order the images were given.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    image:
+      description: The image reference that was removed.
+      type: str
+    changed:
+      description: Whether the reference was present and has been removed.
+      type: bool
+    deleted:
+      description: Whether the image itself was deleted, not only untagged.
+      type: bool
+    reclaimed_bytes:
+      description: Unique size of the image if it was deleted, else C(0).
+      type: int
+    failed:
+      description: Whether the removal of this image failed.
+      type: bool
+    msg:
+      description: Error message for a failed removal.
+      type: str
+      returned: when failed
+pruned_bytes:
+  description: Space reported as reclaimed by the dangling-image prune.
+  type: int
+  returned: always
+reclaimed_bytes:
+  description:
+    - Sum of the per-image reclaimed sizes plus C(pruned_bytes).
+    - Layers shared only among the deleted images are not counted, so this can
+      fall short of the real drop in layer storage.
+    - In check mode, the sum of the per-image estimates.
+  type: int
+  returned: always
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+
+try:
+    from docker.errors import APIError, ImageNotFound, InvalidVersion
+except ImportError:
+    APIError = ImageNotFound = InvalidVersion = Exception  # type: ignore[misc]
+
+from ansible_collections.nixknight.docker.plugins.module_utils.docker_common import (
+    BAD_IMAGE_CHARS,
+    DOCKER_CLIENT_ARGUMENT_SPEC,
+    HTTPError,
+    build_docker_client,
+)
+
+
+def _images_usage(client):
+    """Return image-id -> image summary (Size, SharedSize, RepoTags).
+
+    Shared sizes come from the daemon's disk-usage report. A daemon that
+    cannot produce it falls back to the plain image list, whose SharedSize
+    is -1 (unknown).
+    """
+    try:
+        images = client.api.df().get('Images')
+    except (APIError, InvalidVersion):
+        images = client.api.images()
+    return dict((image['Id'], image) for image in images or [])
+
+
+def _unique_size(image_usage):
+    """Bytes that only this image holds; SharedSize is -1 when unknown."""
+    if not image_usage:
+        return 0
+    return max(0, image_usage.get('Size', 0) - max(0, image_usage.get('SharedSize', 0)))
+
+
+def _remove_image(client, image, images_usage):
+    """Remove one reference and account for the space its image held."""
+    result = dict(image=image, changed=False, deleted=False, reclaimed_bytes=0, failed=False)
+
+    try:
+        image_id = client.api.inspect_image(image)['Id']
+        response = client.api.remove_image(image)
+        result['changed'] = True
+        result['deleted'] = any(
+            entry.get('Deleted') == image_id for entry in response or []
+        )
+        if result['deleted']:
+            result['reclaimed_bytes'] = _unique_size(images_usage.get(image_id))
+    except ImageNotFound:
+        pass
+    except (APIError, HTTPError, OSError) as exc:
+        result['failed'] = True
+        result['msg'] = "Failed to remove %s: %s" % (image, exc)
+
+    return result
+
+
+def remove_images(client, images, workers, images_usage):
+    """Remove every image with at most `workers` removals in flight."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda image: _remove_image(client, image, images_usage), images))
+
+
+def estimate_removals(images, images_usage):
+    """Check-mode plan: an image is deleted once all of its tags are removed."""
+    tag_to_id = dict(
+        (tag, image_id)
+        for image_id, usage in images_usage.items()
+        for tag in usage.get('RepoTags') or []
+    )
+    removed_tags = {}
+    for image in images:
+        if image in tag_to_id:
+            removed_tags.setdefault(tag_to_id[image], []).append(image)
+
+    results = []
+    for image in images:
+        result = dict(image=image, changed=False, deleted=False, reclaimed_bytes=0, failed=False)
+        image_id = tag_to_id.get(image)
+        if image_id is not None:
+            result['changed'] = True
+            # The image goes with the last of its tags
+            all_tags = set(images_usage[image_id].get('RepoTags') or [])
+            if all_tags <= set(removed_tags[image_id]) and image == removed_tags[image_id][-1]:
+                result['deleted'] = True
+                result['reclaimed_bytes'] = _unique_size(images_usage[image_id])
+        results.append(result)
+    return results
+
+
+def main():
+    module_args = dict(
+        images=dict(type='list', elements='str', required=True),
+        workers=dict(type='int', default=4),
+        prune_dangling=dict(type='bool', default=False),
+    )
+    module_args.update(DOCKER_CLIENT_ARGUMENT_SPEC)
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+
+    images = list(dict.fromkeys(module.params['images']))
+    for image in images:
+        if not image or BAD_IMAGE_CHARS.search(image):
+            module.fail_json(msg="image reference is empty or contains control or whitespace characters: %r" % (image,))
+    if module.params['workers'] < 1:
+        module.fail_json(msg="workers must be at least 1")
+
+    result = dict(changed=False, images=[], pruned_bytes=0, reclaimed_bytes=0)
+    if not images and not module.params['prune_dangling']:
+        module.exit_json(**result)
+
+    workers = min(module.params['workers'], max(1, len(images)))
+    client = build_docker_client(
+        module,
+        'docker_image_mgmt_remove',
+        module.params['docker_host'],
+        module.params['tls'],
+        max_pool_size=workers,
+    )
+
+    try:
+        images_usage = _images_usage(client)
+    except (APIError, HTTPError) as exc:
+        module.fail_json(msg="Failed to list Docker images: %s" % exc)
+
+    if module.check_mode:
+        result['images'] = estimate_removals(images, images_usage)
+        result['changed'] = any(image['changed'] for image in result['images'])
+        result['reclaimed_bytes'] = sum(image['reclaimed_bytes'] for image in result['images'])
+        module.exit_json(**result)
+
+    result['images'] = remove_images(client, images, workers, images_usage)
+    result['changed'] = any(image['changed'] for image in result['images'])
+
+    failed = [image['msg'] for image in result['images'] if image['failed']]
+    if not failed and module.params['prune_dangling']:
+        try:
+            pruned = client.api.prune_images(filters={'dangling': True})
+        except (APIError, HTTPError) as exc:
+            failed.append("Failed to prune dangling images: %s" % exc)
+        else:
+            result['pruned_bytes'] = pruned.get('SpaceReclaimed') or 0
+            result['changed'] = result['changed'] or bool(pruned.get('ImagesDeleted'))
+
+    result['reclaimed_bytes'] = (
+        sum(image['reclaimed_bytes'] for image in result['images']) + result['pruned_bytes']
+    )
+
+    if failed:
+        module.fail_json(msg="; ".join(failed), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import pytest
+
+from ansible.errors import AnsibleFilterError
+
+from ansible_collections.nixknight.docker.plugins.filter.compose import FilterModule, compose_service_order
+
+
+def test_dependencies_come_first():
+    services = {
+        'web': {'depends_on': ['api']},
+        'api': {'depends_on': ['db', 'cache']},
+        'cache': {},
+        'db': None,
+    }
+
+    assert compose_service_order(services) == ['cache', 'db', 'api', 'web']
+
+
+def test_independent_services_keep_declaration_order():
+    services = {'worker': {}, 'web': {}, 'db': {}}
+
+    assert compose_service_order(services) == ['worker', 'web', 'db']
+
+
+def test_long_depends_on_syntax():
+    services = {
+        'web': {'depends_on': {'db': {'condition': 'service_healthy'}, 'migrate': {'condition': 'service_completed_successfully'}}},
+        'migrate': {'depends_on': {'db': {'condition': 'service_healthy'}}},
+        'db': {},
+    }
+
+    assert compose_service_order(services) == ['db', 'migrate', 'web']
+
+
+def test_unknown_and_self_dependencies_are_ignored():
+    services = {'web': {'depends_on': ['web', 'external']}, 'db': {}}
+
+    assert compose_service_order(services) == ['web', 'db']
+
+
+def test_cycle_is_an_error():
+    services = {'a': {'depends_on': ['b']}, 'b': {'depends_on': ['a']}, 'c': {}}
+
+    with pytest.raises(AnsibleFilterError, match='cycle: a, b'):
+        compose_service_order(services)
+
+
+@pytest.mark.parametrize('services', [['web', 'db'], None, {'web': {'depends_on': 'db'}}])
+def test_bad_input_is_an_error(services):
+    with pytest.raises(AnsibleFilterError):
+        compose_service_order(services)
+
+
+def test_filter_is_registered():
+    assert FilterModule().filters()['compose_service_order'] is compose_service_order
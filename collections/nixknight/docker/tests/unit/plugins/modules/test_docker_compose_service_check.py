@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import time
+
+from docker.errors import APIError, NotFound
+
+from ansible_collections.nixknight.docker.plugins.modules import docker_compose_service_check as check
+
+
+PROJECT_LABEL = check.COMPOSE_PROJECT_LABEL
+SERVICE_LABEL = check.COMPOSE_SERVICE_LABEL
+
+
+class FakeEvents(object):
+    """The decoded event stream APIClient.events() returns."""
+
+    def __init__(self, events):
+        self._events = iter(events)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAPI(object):
+    """Containers keyed by ID; `on_event` applies each event's state change before it is read."""
+
+    def __init__(self, containers, events=(), stats_errors=None):
+        self.containers_by_id = containers
+        self.pending_events = list(events)
+        self.stats_errors = stats_errors or {}
+        self.event_stream = None
+
+    def containers(self, all=False, filters=None):
+        return [
+            dict(Id=container_id, Labels=container['Config']['Labels'], Names=[container['Name']])
+            for container_id, container in self.containers_by_id.items()
+            if all or container['State']['Status'] == 'running'
+        ]
+
+    def inspect_container(self, container_id):
+        if container_id not in self.containers_by_id:
+            raise NotFound('No such container: %s' % container_id)
+        return self.containers_by_id[container_id]
+
+    def events(self, since=None, until=None, filters=None, decode=False):
+        def replay():
+            for change, event in self.pending_events:
+                change(self.containers_by_id)
+                yield event
+        self.event_stream = FakeEvents(replay())
+        return self.event_stream
+
+    def stats(self, container_id, stream=False):
+        if container_id in self.stats_errors:
+            raise self.stats_errors[container_id]
+        return {'memory_stats': {'usage': 1000, 'limit': 4000}}
+
+
+class FakeClient(object):
+    def __init__(self, api):
+        self.api = api
+
+
+def _container(container_id, project, service, status='running', health=None):
+    state = {'Status': status, 'Restarting': False, 'StartedAt': '2026-01-01T00:00:00.000000000Z'}
+    if health:
+        state['Health'] = {'Status': health}
+    return {
+        'Id': container_id,
+        'Name': '/%s-%s-1' % (project, service),
+        'State': state,
+        'RestartCount': 0,
+        'Config': {'Labels': {PROJECT_LABEL: project, SERVICE_LABEL: service}},
+    }
+
+
+def _event(container_id, project, action):
+    return {
+        'id': container_id,
+        'Action': action,
+        'timeNano': int(time.time() * 1e9),
+        'Actor': {'ID': container_id, 'Attributes': {PROJECT_LABEL: project}},
+    }
+
+
+def _set_health(container_id, health):
+    def change(containers):
+        containers[container_id]['State']['Health'] = {'Status': health}
+    return change
+
+
+def test_wait_returns_at_once_when_everything_is_ready():
+    api = FakeAPI({'a': _container('a', 'web', 'app'), 'b': _container('b', 'web', 'db', health='healthy')})
+
+    wait = check.wait_for_project_containers(FakeClient(api), ['web'], 'healthy', 30)
+
+    assert wait['ready']
+    assert api.event_stream is None
+    assert [c['ready_after'] for c in wait['containers']] == [0.0, 0.0]
+    assert [c['service'] for c in wait['containers']] == ['app', 'db']
+
+
+def test_wait_follows_events_until_the_container_is_healthy():
+    api = FakeAPI(
+        {'a': _container('a', 'web', 'app', health='starting'), 'x': _container('x', 'other', 'app')},
+        events=[
+            (lambda containers: None, _event('x', 'other', 'restart')),
+            (_set_health('a', 'healthy'), _event('a', 'web', 'health_status: healthy')),
+        ],
+    )
+
+    wait = check.wait_for_project_containers(FakeClient(api), ['web'], 'healthy', 30)
+
+    assert wait['ready']
+    assert api.event_stream.closed
+    assert [c['id'] for c in wait['containers']] == ['a']
+    assert wait['containers'][0]['health'] == 'healthy'
+    assert wait['containers'][0]['ready_after'] is not None
+
+
+def test_wait_running_ignores_the_healthcheck():
+    api = FakeAPI({'a': _container('a', 'web', 'app', health='starting')})
+
+    wait = check.wait_for_project_containers(FakeClient(api), ['web'], 'running', 30)
+
+    assert wait['ready']
+
+
+def test_wait_reports_not_ready_when_the_stream_ends():
+    api = FakeAPI({'a': _container('a', 'web', 'app', health='unhealthy')})
+
+    wait = check.wait_for_project_containers(FakeClient(api), ['web', 'missing'], 'healthy', 1)
+
+    assert not wait['ready']
+    assert wait['containers'][0]['ready_after'] is None
+
+
+def test_wait_drops_containers_destroyed_during_the_wait():
+    def destroy(containers):
+        del containers['b']
+
+    api = FakeAPI(
+        {'a': _container('a', 'web', 'app'), 'b': _container('b', 'web', 'old', status='exited')},
+        events=[(destroy, _event('b', 'web', 'destroy'))],
+    )
+
+    wait = check.wait_for_project_containers(FakeClient(api), ['web'], 'running', 30)
+
+    assert wait['ready']
+    assert [c['id'] for c in wait['containers']] == ['a']
+
+
+def test_collect_stats_reports_errors_per_container():
+    api = FakeAPI(
+        {'a': _container('a', 'web', 'app'), 'b': _container('b', 'web', 'db')},
+        stats_errors={'b': APIError('500 Server Error: container is being removed')},
+    )
+    projects = {'web': [{'id': 'a', 'name': 'web-app-1'}, {'id': 'b', 'name': 'web-db-1'}, {'id': 'c', 'name': 'gone'}]}
+
+    totals = check.collect_project_stats(FakeClient(api), projects, 2)
+
+    sampled, failed, gone = projects['web']
+    assert sampled['stats']['memory_usage'] == 1000
+    assert sampled['stats']['memory_percent'] == 25.0
+    assert 'stats_error' not in sampled
+    assert failed['stats'] is None
+    assert 'container is being removed' in failed['stats_error']
+    assert gone['stats'] is None and 'stats_error' not in gone
+    assert totals['web']['container_count'] == 1
+    assert totals['web']['memory_usage'] == 1000
+
+
+def test_get_running_project_containers_groups_by_project():
+    api = FakeAPI({
+        'a': _container('a', 'web', 'app'),
+        'b': _container('b', 'db', 'pg'),
+        'c': _container('c', 'web', 'worker', status='exited'),
+    })
+
+    projects, error = check.get_running_project_containers(FakeClient(api), ['web', 'db', 'none'])
+
+    assert error is None
+    assert [c['service'] for c in projects['web']] == ['app']
+    assert [c['service'] for c in projects['db']] == ['pg']
+    assert projects['none'] == []
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+
+import pytest
+
+from ansible_collections.nixknight.docker.plugins.modules import docker_image_mgmt_plan as plan
+
+
+class FakeAPI(object):
+    """A daemon whose clock, identity and event log the tests move by hand."""
+
+    base_url = 'http+docker://localhost'
+
+    def __init__(self):
+        self.daemon_id = 'daemon-a'
+        self.system_time = '2026-01-01T00:00:00.000000001Z'
+        self.pending_events = []
+        self.calls = []
+        self.images_list = [dict(Id='sha256:a', RepoTags=['postgres:16'], RepoDigests=[])]
+        self.containers_list = [dict(Id='c1', ImageID='sha256:a')]
+
+    def info(self):
+        self.calls.append('info')
+        return dict(ID=self.daemon_id, SystemTime=self.system_time)
+
+    def events(self, since=None, until=None, filters=None, decode=False):
+        self.calls.append(('events', since, until, filters))
+        events, self.pending_events = self.pending_events, []
+        return iter(events)
+
+    def images(self):
+        self.calls.append('images')
+        return self.images_list
+
+    def containers(self, all=False):
+        self.calls.append('containers')
+        return self.containers_list
+
+    def get_adapter(self, url):
+        return object()
+
+
+class FakeClient(object):
+    def __init__(self, api):
+        self.api = api
+
+
+@pytest.fixture
+def client():
+    return FakeClient(FakeAPI())
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return dict(path=str(tmp_path / 'inventory.json'), max_age=300, key='default')
+
+
+def _snapshot(client, cache):
+    client.api.calls = []
+    images, containers, api_calls, status = plan._cached_daemon_snapshot(client, cache)
+    assert api_calls == len(client.api.calls)
+    return images, containers, status
+
+
+def test_daemon_time_keeps_nanoseconds_and_offsets():
+    assert plan._daemon_time(dict(SystemTime='2026-01-01T00:00:00.123456789Z')) == (1767225600.123456789, '1767225600.123456789')
+    assert plan._daemon_time(dict(SystemTime='2026-01-01T02:00:00.5+02:00'))[1] == '1767225600.500000000'
+    assert plan._daemon_time(dict(SystemTime='2026-01-01T00:00:00Z'))[1] == '1767225600.000000000'
+    with pytest.raises(RuntimeError):
+        plan._daemon_time(dict(SystemTime='yesterday'))
+
+
+def test_snapshot_miss_then_hit(client, cache):
+    assert _snapshot(client, cache)[2] == 'miss'
+    assert client.api.calls == ['info', 'images', 'containers']
+
+    client.api.system_time = '2026-01-01T00:01:00.000000002Z'
+    images, containers, status = _snapshot(client, cache)
+
+    assert status == 'hit'
+    assert images == client.api.images_list and containers == client.api.containers_list
+    # The cursor is the daemon's clock, and the events query is not filtered by type
+    assert client.api.calls == ['info', ('events', '1767225600.000000001', '1767225660.000000002', None)]
+    with open(cache['path']) as f:
+        assert json.load(f)['daemons']['default']['cursor'] == '1767225660.000000002'
+
+
+def test_snapshot_refreshes_only_what_events_touched(client, cache):
+    _snapshot(client, cache)
+    client.api.pending_events = [dict(Type='image', Action='pull'), dict(Type='container', Action='start')]
+
+    assert _snapshot(client, cache)[2] == 'refreshed'
+    assert client.api.calls[2:] == ['images']
+
+
+def test_snapshot_rebuilds_when_the_event_buffer_overflowed(client, cache):
+    _snapshot(client, cache)
+    # Events of types the planner ignores still fill the daemon's buffer
+    client.api.pending_events = [dict(Type='network', Action='connect')] * plan.DAEMON_EVENTS_BUFFER
+
+    assert _snapshot(client, cache)[2] == 'miss'
+    assert client.api.calls[2:] == ['images', 'containers']
+
+
+def test_snapshot_rebuilds_when_the_daemon_id_changes(client, cache):
+    _snapshot(client, cache)
+    client.api.daemon_id = 'daemon-b'
+
+    assert _snapshot(client, cache)[2] == 'miss'
+    assert 'events' not in [call[0] for call in client.api.calls if isinstance(call, tuple)]
+
+
+def test_snapshot_rebuilds_when_the_daemon_restarted(client, cache, monkeypatch):
+    processes = iter(['boot:100:5000', 'boot:100:5000', 'boot:230:9000'])
+    monkeypatch.setattr(plan, '_daemon_process', lambda client: next(processes))
+
+    assert _snapshot(client, cache)[2] == 'miss'
+    assert _snapshot(client, cache)[2] == 'hit'
+    assert _snapshot(client, cache)[2] == 'miss'
+
+
+def test_snapshot_rebuilds_after_max_age_on_the_daemon_clock(client, cache):
+    _snapshot(client, cache)
+    client.api.system_time = '2026-01-01T00:05:01Z'
+
+    assert _snapshot(client, cache)[2] == 'miss'
+
+
+def test_daemon_process_is_unknown_for_a_remote_daemon(client):
+    client.api.base_url = 'https://docker-host:2376'
+    assert plan._daemon_process(client) is None
+
+
+def test_daemon_process_reads_the_pidfile_next_to_the_socket(client, tmp_path):
+    class Adapter(object):
+        socket_path = str(tmp_path / 'docker.sock')
+    client.api.get_adapter = lambda url: Adapter()
+    (tmp_path / 'docker.pid').write_text('%d\n' % os.getpid())
+
+    process = plan._daemon_process(client)
+
+    assert process and process.split(':')[1] == str(os.getpid())
+    assert plan._daemon_process(client) == process
+    (tmp_path / 'docker.pid').unlink()
+    assert plan._daemon_process(client) is None
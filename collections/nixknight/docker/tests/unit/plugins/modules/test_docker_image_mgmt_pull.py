@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+import pytest
+import requests
+
+from docker.errors import ImageNotFound
+from urllib3.exceptions import ReadTimeoutError
+
+from ansible_collections.nixknight.docker.plugins.modules import docker_image_mgmt_pull as pull
+
+
+class FakeResponse(object):
+    """A streamed /images/create response; `lines` may hold exceptions to raise mid-stream."""
+
+    def __init__(self, lines, status_code=200):
+        self.lines = lines
+        self.status_code = status_code
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self):
+        for line in self.lines:
+            if isinstance(line, Exception):
+                raise line
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAPI(object):
+    base_url = 'http+docker://localhost'
+    api_version = '1.43'
+
+    def __init__(self, image_ids, responses):
+        self.image_ids = image_ids
+        self.responses = responses
+        self.requests = []
+
+    def inspect_image(self, image):
+        if image not in self.image_ids:
+            raise ImageNotFound('No such image: %s' % image)
+        return dict(Id=self.image_ids[image])
+
+    def post(self, url, params=None, headers=None, stream=False, timeout=None):
+        self.requests.append(dict(url=url, params=params, headers=headers, stream=stream, timeout=timeout))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if response.status_code == 200:
+            reference = '%s:%s' % (params['fromImage'], params['tag'])
+            self.image_ids[reference] = 'sha256:new'
+        return response
+
+
+class FakeClient(object):
+    def __init__(self, api):
+        self.api = api
+
+
+def _progress(*events):
+    return [json.dumps(event).encode() for event in events]
+
+
+@pytest.fixture(autouse=True)
+def no_registry_auth(monkeypatch):
+    monkeypatch.setattr(pull.auth, 'get_config_header', lambda client, registry: None)
+
+
+def test_pull_arguments():
+    assert pull._pull_arguments('postgres') == ('postgres', 'latest')
+    assert pull._pull_arguments('localhost:5000/app:1.2') == ('localhost:5000/app', '1.2')
+    assert pull._pull_arguments('app@sha256:abc') == ('app', 'sha256:abc')
+
+
+def test_pull_streams_with_a_socket_timeout_and_reports_the_new_id():
+    response = FakeResponse(_progress({'status': 'Pulling'}, {'status': 'Downloaded newer image'}))
+    api = FakeAPI({'app:1': 'sha256:old'}, [response])
+
+    (result,) = pull.pull_images(FakeClient(api), ['app:1'], 1, 30)
+
+    assert (result['changed'], result['failed'], result['timed_out']) == (True, False, False)
+    assert (result['previous_id'], result['id']) == ('sha256:old', 'sha256:new')
+    assert api.requests == [dict(
+        url='http+docker://localhost/v1.43/images/create',
+        params=dict(fromImage='app', tag='1'),
+        headers={},
+        stream=True,
+        timeout=30,
+    )]
+    assert response.closed
+
+
+def test_pull_reports_an_error_event():
+    response = FakeResponse(_progress({'status': 'Pulling'}, {'error': 'manifest unknown'}))
+
+    (result,) = pull.pull_images(FakeClient(FakeAPI({}, [response])), ['app:1'], 1, 30)
+
+    assert result['failed'] and not result['timed_out']
+    assert result['msg'] == 'Failed to pull app:1: manifest unknown'
+    assert response.closed
+
+
+def test_pull_reports_an_http_error():
+    response = requests.Response()
+    response.status_code = 404
+    response._content = b'{"message": "pull access denied for app"}'
+    response.url = 'http+docker://localhost/v1.43/images/create'
+
+    (result,) = pull.pull_images(FakeClient(FakeAPI({}, [response])), ['app:1'], 1, 30)
+
+    assert result['failed'] and not result['timed_out']
+    assert 'pull access denied for app' in result['msg']
+
+
+def test_pull_reports_a_stalled_stream_as_a_timeout():
+    stall = requests.exceptions.ConnectionError(ReadTimeoutError(None, None, 'Read timed out.'))
+    response = FakeResponse(_progress({'status': 'Pulling'}) + [stall])
+
+    (result,) = pull.pull_images(FakeClient(FakeAPI({}, [response])), ['app:1'], 1, 30)
+
+    assert result['failed'] and result['timed_out']
+    assert result['msg'] == 'Timed out pulling app:1: the pull did not complete within 30 seconds'
+    assert response.closed
+
+
+def test_pull_reports_a_timeout_before_the_stream_starts():
+    api = FakeAPI({}, [requests.exceptions.ReadTimeout('Read timed out.')])
+
+    (result,) = pull.pull_images(FakeClient(api), ['app:1'], 1, 30)
+
+    assert result['timed_out']
+
+
+def test_pull_abandons_a_stream_that_outlives_the_deadline(monkeypatch):
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(pull.time, 'monotonic', lambda: next(clock))
+    response = FakeResponse(_progress(*[{'status': 'Downloading'}] * 10))
+
+    (result,) = pull.pull_images(FakeClient(FakeAPI({}, [response])), ['app:1'], 1, 25)
+
+    assert result['timed_out']
+    assert response.closed
+    # Stopped reading at the first event past the deadline
+    assert result['id'] is None
+
+
+def test_pull_failure_is_not_a_timeout():
+    api = FakeAPI({}, [requests.exceptions.ConnectionError('Connection refused')])
+
+    (result,) = pull.pull_images(FakeClient(api), ['app:1'], 1, 30)
+
+    assert result['failed'] and not result['timed_out']
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+from docker.errors import APIError, ImageNotFound
+
+from ansible_collections.nixknight.docker.plugins.modules import docker_image_mgmt_remove as remove
+
+
+class FakeAPI(object):
+    """Images keyed by ID, each with its tags, sizes and the containers using it."""
+
+    def __init__(self, images, df_error=None, in_use=()):
+        self.images_by_id = images
+        self.df_error = df_error
+        self.in_use = set(in_use)
+        self.calls = []
+
+    def _summaries(self, shared_size):
+        return [
+            dict(Id=image_id, RepoTags=list(image['tags']), Size=image['size'],
+                 SharedSize=image['shared'] if shared_size else -1)
+            for image_id, image in self.images_by_id.items()
+        ]
+
+    def df(self):
+        self.calls.append('df')
+        if self.df_error:
+            raise self.df_error
+        return dict(Images=self._summaries(True), Containers=[], Volumes=[], LayersSize=0)
+
+    def images(self):
+        self.calls.append('images')
+        return self._summaries(False)
+
+    def _image_id(self, reference):
+        for image_id, image in self.images_by_id.items():
+            if reference in image['tags']:
+                return image_id
+        raise ImageNotFound('No such image: %s' % reference)
+
+    def inspect_image(self, reference):
+        return dict(Id=self._image_id(reference))
+
+    def remove_image(self, reference):
+        image_id = self._image_id(reference)
+        if image_id in self.in_use:
+            raise APIError('conflict: image is being used by a running container')
+        image = self.images_by_id[image_id]
+        image['tags'].remove(reference)
+        if image['tags']:
+            return [dict(Untagged=reference)]
+        del self.images_by_id[image_id]
+        return [dict(Untagged=reference), dict(Deleted=image_id)]
+
+
+class FakeClient(object):
+    def __init__(self, api):
+        self.api = api
+
+
+def _images():
+    return {
+        'sha256:app1': dict(tags=['app:1'], size=1000, shared=400),
+        'sha256:app2': dict(tags=['app:2', 'app:stable'], size=900, shared=400),
+        'sha256:db': dict(tags=['db:16'], size=500, shared=0),
+    }
+
+
+def test_images_usage_reads_shared_sizes_from_disk_usage():
+    api = FakeAPI(_images())
+
+    usage = remove._images_usage(FakeClient(api))
+
+    assert api.calls == ['df']
+    assert usage['sha256:app1']['SharedSize'] == 400
+    assert remove._unique_size(usage['sha256:app1']) == 600
+
+
+def test_images_usage_falls_back_to_the_image_list():
+    api = FakeAPI(_images(), df_error=APIError('not supported'))
+
+    usage = remove._images_usage(FakeClient(api))
+
+    assert api.calls == ['df', 'images']
+    # Shared size unknown: the whole image is counted
+    assert remove._unique_size(usage['sha256:app1']) == 1000
+
+
+def test_remove_images_accounts_only_for_deleted_images():
+    client = FakeClient(FakeAPI(_images()))
+    usage = remove._images_usage(client)
+
+    results = remove.remove_images(client, ['app:1', 'app:2', 'gone:1'], 2, usage)
+
+    assert [(r['image'], r['changed'], r['deleted'], r['reclaimed_bytes']) for r in results] == [
+        ('app:1', True, True, 600),
+        ('app:2', True, False, 0),
+        ('gone:1', False, False, 0),
+    ]
+    assert 'sha256:app2' in client.api.images_by_id
+
+
+def test_remove_images_reports_an_image_in_use():
+    client = FakeClient(FakeAPI(_images(), in_use=['sha256:db']))
+
+    (result,) = remove.remove_images(client, ['db:16'], 1, remove._images_usage(client))
+
+    assert result['failed'] and not result['changed']
+    assert 'Failed to remove db:16' in result['msg']
+
+
+def test_estimate_removals_deletes_an_image_with_its_last_tag():
+    usage = remove._images_usage(FakeClient(FakeAPI(_images())))
+
+    results = remove.estimate_removals(['app:2', 'app:stable', 'db:16', 'gone:1'], usage)
+
+    assert [(r['image'], r['changed'], r['deleted'], r['reclaimed_bytes']) for r in results] == [
+        ('app:2', True, False, 0),
+        ('app:stable', True, True, 500),
+        ('db:16', True, True, 500),
+        ('gone:1', False, False, 0),
+    ]
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+"""Helpers shared by the nixknight.kubernetes modules that handle boot assets."""
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Boot assets run to several GB; read them in large chunks.
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# ioctl(2) request that clones a file's extents (btrfs, XFS with reflink=1).
+FICLONE = 0x40049409
+
+# Per-directory record of each asset's sha256, keyed by basename, together
+# with the size and mtime it was hashed at. Hidden, so listings skip it.
+SIDECAR_NAME = '.tbi-assets.json'
+
+
+def sha256_file(path):
+    """Return the hex sha256 of a file, read in one streaming pass."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _reflink(src, dst):
+    """Clone src into the new file dst; raise OSError where unsupported."""
+    with open(src, 'rb') as source, open(dst, 'wb') as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def link_or_copy(src, dst, mode=None):
+    """Place src at dst without duplicating data where the filesystem allows.
+
+    Tries a hardlink first, then a reflink, then a plain copy. dst is
+    replaced atomically. Returns the method used: C(hardlink), C(reflink) or
+    C(copy). A hardlink shares the inode, so C(mode) applies to both names.
+    """
+    directory = os.path.dirname(dst) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(dst))
+    os.close(fd)
+    os.unlink(tmp_path)
+    try:
+        try:
+            os.link(src, tmp_path)
+            method = 'hardlink'
+        except OSError as exc:
+            if exc.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                raise
+            try:
+                _reflink(src, tmp_path)
+                method = 'reflink'
+            except OSError:
+                shutil.copyfile(src, tmp_path)
+                method = 'copy'
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, dst)
+    except Exception:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return method
+
+
+def asset_record(path, sha256):
+    """Sidecar record tying sha256 to the file's current size and mtime."""
+    st = os.stat(path)
+    return dict(size=st.st_size, mtime_ns=st.st_mtime_ns, sha256=sha256)
+
+
+def record_is_current(path, record):
+    """Whether a sidecar record still describes the file at path."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return (bool(record) and record.get('size') == st.st_size
+            and record.get('mtime_ns') == st.st_mtime_ns)
+
+
+def read_sidecar(directory):
+    """Return the directory's asset records; empty when missing or unreadable."""
+    try:
+        with open(os.path.join(directory, SIDECAR_NAME)) as f:
+            records = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    return records if isinstance(records, dict) else {}
+
+
+def write_sidecar(directory, records):
+    """Replace the directory's asset records atomically."""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='%s.' % SIDECAR_NAME)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(records, f, indent=2, sort_keys=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(directory, SIDECAR_NAME))
+    except Exception:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def update_sidecar(directory, records):
+    """Merge records (basename -> record) into the directory's sidecar."""
+    if not records:
+        return
+    merged = read_sidecar(directory)
+    merged.update(records)
+    write_sidecar(directory, merged)
@@ -0,0 +1,374 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: talos_asset_cache
+short_description: Content-addressed cache of Talos boot assets shared by build profiles
+version_added: "0.1.2"
+description:
+  - Keep every built or downloaded Talos boot asset once in a shared cache
+    directory, under a key that identifies what it was built from (for
+    example backend, schematic ID, Talos version, architecture and format).
+  - With O(state=restore), the files of every cached entry are placed into
+    O(output_dir) as hardlinks (falling back to a reflink, then a copy, across
+    filesystems), so the role's download/build steps find them present and
+    skip the work.
+  - With O(state=store), the files the role produced for entries not yet
+    cached are added to the cache, each with its sha256 and size. A hash
+    already in the C(.tbi-assets.json) sidecar of O(output_dir) (written by
+    M(nixknight.kubernetes.talos_factory_download)) is reused while the file's
+    size and mtime match; otherwise the file is hashed once here.
+  - Both states record the hashes of the files they handle in that sidecar,
+    together with the entry key, so
+    M(nixknight.kubernetes.talos_asset_record) does not read them again and a
+    later restore can tell which key a file was produced for.
+  - Entries are written to a temporary directory and renamed into place, so a
+    half-written entry is never seen as cached.
+  - Supports C(check_mode); nothing is linked, removed or stored.
+options:
+  cache_dir:
+    description:
+      - Root of the cache. Each entry is a C(<cache_dir>/<key>/) directory
+        holding the files and an C(index.json) with their sha256 and size.
+    required: true
+    type: path
+  output_dir:
+    description:
+      - Directory the files are restored to or stored from.
+    required: true
+    type: path
+  entries:
+    description:
+      - Cache entries to restore or store.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      key:
+        description:
+          - Cache key; a hex digest of whatever identifies the build inputs.
+        required: true
+        type: str
+      files:
+        description:
+          - Basenames of the files in O(output_dir) that make up the entry.
+        required: true
+        type: list
+        elements: str
+  state:
+    description:
+      - C(restore) links cached entries into O(output_dir). On a miss, a file
+        of that entry already in O(output_dir) is kept when it matches its
+        O(expected_checksums) entry or, without one, when its current sidecar
+        record carries the entry's key; C(store) then adopts it into the
+        cache. Any other file is stale (for example left from an older Talos
+        version) and is removed, so the role downloads or builds it afresh.
+      - C(store) adds the entries whose files are all present in
+        O(output_dir) and that are not cached yet.
+    required: false
+    type: str
+    choices: [restore, store]
+    default: restore
+  mode:
+    description:
+      - Mode applied to restored and stored files. Hardlinked names share it.
+    required: false
+    type: raw
+  expected_checksums:
+    description:
+      - Expected sha256 per basename. On a restore miss, a file in
+        O(output_dir) that matches its expected hash is kept and one that
+        does not is removed.
+    required: false
+    type: dict
+    default: {}
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Restore cached assets into the profile directory
+  nixknight.kubernetes.talos_asset_cache:
+    cache_dir: /var/cache/talos-images
+    output_dir: /srv/talos-images/worker
+    state: restore
+    entries:
+      - key: "{{ {'schematic': schematic_id, 'version': 'v1.12.7', 'arch': 'amd64', 'format': 'iso'} | to_json | hash('sha256') }}"
+        files:
+          - metal-amd64.iso
+  register: restored
+
+- name: Store newly built assets
+  nixknight.kubernetes.talos_asset_cache:
+    cache_dir: /var/cache/talos-images
+    output_dir: /srv/talos-images/worker
+    state: store
+    entries: "{{ restored.misses }}"
+'''
+
+RETURN = r'''
+changed:
+  description: Whether any file was linked, removed or stored.
+  type: bool
+  returned: always
+hits:
+  description: Keys of the entries found in the cache.
+  type: list
+  elements: str
+  returned: always
+misses:
+  description: The entries (key and files) not found in the cache.
+  type: list
+  elements: dict
+  returned: always
+stored:
+  description: Keys of the entries added to the cache by this run.
+  type: list
+  elements: str
+  returned: always
+kept:
+  description: Basenames of the files of missed entries that were left in place.
+  type: list
+  elements: str
+  returned: always
+assets:
+  description:
+    - Per-file records of the cached entries that were restored or stored,
+      keyed by basename.
+  type: dict
+  returned: always
+  sample:
+    metal-amd64.iso:
+      sha256: "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+      size: 104857600
+      method: hardlink
+'''
+
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.nixknight.kubernetes.plugins.module_utils.talos_assets import (
+    asset_record,
+    link_or_copy,
+    read_sidecar,
+    record_is_current,
+    sha256_file,
+    update_sidecar,
+)
+
+
+CACHE_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+INDEX_NAME = 'index.json'
+
+
+def _read_index(entry_dir, files):
+    """Return the entry's file index if every file is present at its recorded size."""
+    try:
+        with open(os.path.join(entry_dir, INDEX_NAME)) as f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    for name in files:
+        record = index.get(name)
+        if not record:
+            return None
+        try:
+            if os.path.getsize(os.path.join(entry_dir, name)) != record['size']:
+                return None
+        except OSError:
+            return None
+    return index
+
+
+def _keyed_record(path, sha256, key):
+    """A sidecar record that also names the cache key the file belongs to."""
+    return dict(asset_record(path, sha256), key=key)
+
+
+def _held_sha256(path, key, record, expected):
+    """Return the sha256 of an output file known to hold the entry's content, else None.
+
+    An expected checksum decides on its own. Without one, only a current
+    sidecar record written for the same key vouches for the file.
+    """
+    if not os.path.isfile(path) or os.path.islink(path):
+        return None
+    current = record_is_current(path, record)
+    if expected:
+        sha256 = record['sha256'] if current else sha256_file(path)
+        return sha256 if sha256 == expected else None
+    if current and record.get('key') == key:
+        return record['sha256']
+    return None
+
+
+def restore_entries(module, cache_dir, output_dir, entries, mode, expected_checksums):
+    """Link every cached entry into output_dir; clear stale files of the misses."""
+    result = dict(changed=False, hits=[], misses=[], stored=[], kept=[], assets={})
+    sidecar = read_sidecar(output_dir)
+    records = {}
+
+    for entry in entries:
+        entry_dir = os.path.join(cache_dir, entry['key'])
+        index = _read_index(entry_dir, entry['files'])
+        if index is None:
+            result['misses'].append(entry)
+            for name in entry['files']:
+                path = os.path.join(output_dir, name)
+                if not os.path.lexists(path):
+                    continue
+                record = sidecar.get(name)
+                sha256 = _held_sha256(path, entry['key'], record, expected_checksums.get(name))
+                if sha256 is not None:
+                    # Left for the download/build steps to skip and store to adopt
+                    result['kept'].append(name)
+                    if not module.check_mode and not record_is_current(path, record):
+                        records[name] = _keyed_record(path, sha256, entry['key'])
+                    continue
+                result['changed'] = True
+                if not module.check_mode:
+                    os.unlink(path)
+            continue
+
+        result['hits'].append(entry['key'])
+        for name in entry['files']:
+            cached = os.path.join(entry_dir, name)
+            path = os.path.join(output_dir, name)
+            record = dict(sha256=index[name]['sha256'], size=index[name]['size'], method=None)
+            try:
+                linked = os.path.samefile(cached, path)
+            except OSError:
+                linked = False
+            if linked:
+                record['method'] = 'hardlink'
+            else:
+                result['changed'] = True
+                if not module.check_mode:
+                    record['method'] = link_or_copy(cached, path, mode)
+            result['assets'][name] = record
+            current = sidecar.get(name)
+            if not module.check_mode and not (record_is_current(path, current) and current.get('key') == entry['key']):
+                records[name] = _keyed_record(path, record['sha256'], entry['key'])
+
+    update_sidecar(output_dir, records)
+    return result
+
+
+def store_entries(module, cache_dir, output_dir, entries, mode):
+    """Add the entries not cached yet, with each file's sha256 and size."""
+    result = dict(changed=False, hits=[], misses=[], stored=[], kept=[], assets={})
+    sidecar = read_sidecar(output_dir)
+    records = {}
+
+    for entry in entries:
+        entry_dir = os.path.join(cache_dir, entry['key'])
+        if _read_index(entry_dir, entry['files']) is not None:
+            result['hits'].append(entry['key'])
+            continue
+        if not all(os.path.isfile(os.path.join(output_dir, name)) for name in entry['files']):
+            result['misses'].append(entry)
+            continue
+
+        result['changed'] = True
+        result['stored'].append(entry['key'])
+        if module.check_mode:
+            continue
+
+        staging_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.%s.' % entry['key'])
+        try:
+            index = {}
+            for name in entry['files']:
+                path = os.path.join(output_dir, name)
+                if record_is_current(path, sidecar.get(name)):
+                    sha256 = sidecar[name]['sha256']
+                else:
+                    sha256 = sha256_file(path)
+                records[name] = _keyed_record(path, sha256, entry['key'])
+                cached = os.path.join(staging_dir, name)
+                method = link_or_copy(path, cached, mode)
+                index[name] = dict(sha256=sha256, size=os.path.getsize(cached))
+                result['assets'][name] = dict(index[name], method=method)
+            with open(os.path.join(staging_dir, INDEX_NAME), 'w') as f:
+                json.dump(index, f, indent=2, sort_keys=True)
+            # An incomplete entry under the final name is replaced
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.rename(staging_dir, entry_dir)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+    update_sidecar(output_dir, records)
+    return result
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            cache_dir=dict(type='path', required=True),
+            output_dir=dict(type='path', required=True),
+            entries=dict(
+                type='list',
+                elements='dict',
+                required=True,
+                options=dict(
+                    key=dict(type='str', required=True, no_log=False),
+                    files=dict(type='list', elements='str', required=True),
+                ),
+            ),
+            state=dict(type='str', choices=['restore', 'store'], default='restore'),
+            mode=dict(type='raw', required=False, default=None),
+            expected_checksums=dict(type='dict', required=False, default={}),
+        ),
+        supports_check_mode=True,
+    )
+
+    cache_dir = module.params['cache_dir']
+    output_dir = module.params['output_dir']
+    entries = module.params['entries']
+
+    for entry in entries:
+        if not CACHE_KEY_RE.match(entry['key']):
+            module.fail_json(msg="cache key must match %s: %r" % (CACHE_KEY_RE.pattern, entry['key']))
+        for name in entry['files']:
+            if not name or os.path.basename(name) != name or name in ('.', '..', INDEX_NAME):
+                module.fail_json(msg="entry files must be plain basenames: %r" % (name,))
+
+    mode = module.params['mode']
+    if isinstance(mode, str):
+        try:
+            mode = int(mode, 8)
+        except ValueError:
+            module.fail_json(msg="mode must be an octal string or integer: %r" % (mode,))
+
+    if not os.path.isdir(output_dir):
+        module.fail_json(msg="output_dir does not exist or is not a directory: %s" % output_dir)
+    if not module.check_mode and not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, 0o750)
+
+    try:
+        if module.params['state'] == 'restore':
+            result = restore_entries(module, cache_dir, output_dir, entries, mode,
+                                     module.params['expected_checksums'] or {})
+        else:
+            result = store_entries(module, cache_dir, output_dir, entries, mode)
+    except (IOError, OSError) as exc:
+        module.fail_json(msg="Asset cache operation failed: %s" % exc)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: talos_asset_record
+short_description: Record the size and sha256 of the boot assets in a directory
+version_added: "0.1.2"
+description:
+  - List the regular, non-hidden files of a directory and return the path,
+    size and sha256 of each, for the build manifest.
+  - Hashes come from the directory's C(.tbi-assets.json) sidecar, written in
+    the same pass that produced each file by
+    M(nixknight.kubernetes.talos_factory_download) and
+    M(nixknight.kubernetes.talos_asset_cache). A file is read and hashed again
+    only when its size or mtime no longer match its record, or when it has
+    none (for example a file built by the imager with no cache in use).
+  - New hashes are written back to the sidecar; records of files that are gone
+    are dropped.
+  - Supports C(check_mode); the sidecar is not written.
+options:
+  path:
+    description:
+      - Directory holding the assets. Subdirectories are not descended.
+    required: true
+    type: path
+  excludes:
+    description:
+      - Basenames to leave out, for example a rendered schematic.
+    required: false
+    type: list
+    elements: str
+    default: []
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Record the assets of a profile
+  nixknight.kubernetes.talos_asset_record:
+    path: /srv/talos-images/worker
+    excludes:
+      - schematic-amd64.yaml
+  register: recorded
+
+- name: Show each asset's hash
+  ansible.builtin.debug:
+    msg: "{{ item.name }}: {{ item.sha256 }}"
+  loop: "{{ recorded.assets }}"
+'''
+
+RETURN = r'''
+changed:
+  description: Whether the sidecar was rewritten.
+  type: bool
+  returned: always
+assets:
+  description: One record per asset, sorted by name.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    path:
+      description: Absolute path of the asset.
+      type: str
+    name:
+      description: Basename of the asset.
+      type: str
+    size:
+      description: Size in bytes.
+      type: int
+    sha256:
+      description: Hex sha256 of the content.
+      type: str
+rehashed:
+  description: Basenames of the assets that had to be read and hashed.
+  type: list
+  elements: str
+  returned: always
+'''
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ansible_collections.nixknight.kubernetes.plugins.module_utils.talos_assets import (
+    asset_record,
+    read_sidecar,
+    record_is_current,
+    sha256_file,
+    write_sidecar,
+)
+
+
+def record_assets(directory, excludes, check_mode):
+    """Return (assets, rehashed, changed), refreshing stale sidecar records."""
+    sidecar = read_sidecar(directory)
+    records = {}
+    rehashed = []
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('.') or name in excludes or not os.path.isfile(path):
+            continue
+        record = sidecar.get(name)
+        if not record_is_current(path, record):
+            record = asset_record(path, sha256_file(path))
+            rehashed.append(name)
+        records[name] = record
+
+    changed = records != sidecar
+    if changed and not check_mode:
+        write_sidecar(directory, records)
+
+    assets = [
+        dict(path=os.path.join(directory, name), name=name,
+             size=record['size'], sha256=record['sha256'])
+        for name, record in sorted(records.items())
+    ]
+    return assets, rehashed, changed
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            path=dict(type='path', required=True),
+            excludes=dict(type='list', elements='str', default=[]),
+        ),
+        supports_check_mode=True,
+    )
+
+    directory = module.params['path']
+    if not os.path.isdir(directory):
+        if module.check_mode:
+            # Not created yet: the run that would create it is a dry run too
+            module.exit_json(changed=False, assets=[], rehashed=[])
+        module.fail_json(msg="path does not exist or is not a directory: %s" % directory)
+
+    try:
+        assets, rehashed, changed = record_assets(
+            directory, set(module.params['excludes']), module.check_mode)
+    except (IOError, OSError) as exc:
+        module.fail_json(msg="Failed to record assets in %s: %s" % (directory, exc))
+
+    module.exit_json(changed=changed, assets=assets, rehashed=rehashed)
+
+
+if __name__ == '__main__':
+    main()
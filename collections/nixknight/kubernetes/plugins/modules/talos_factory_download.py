@@ -0,0 +1,475 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: talos_factory_download
+short_description: Download Talos Image Factory assets concurrently, resuming partial files
+version_added: "0.1.2"
+description:
+  - Fetch a batch of boot assets (typically every format of every build
+    profile) from the Talos Image Factory, or any HTTP server standing in for
+    it, with a bounded pool of concurrent downloads.
+  - Each asset is streamed to C(<dest>.part) and hashed (sha256) as it
+    arrives. A failed attempt keeps the partial file and the next attempt
+    resumes it with an HTTP C(Range) request; a server that answers with the
+    whole body instead restarts the file from zero.
+  - The partial file is renamed over O(downloads[].dest) only once the body
+    is complete (matching C(Content-Length) / C(Content-Range)) and any
+    expected checksum matches.
+  - The sha256, size and mtime of every file written are recorded in the
+    C(.tbi-assets.json) sidecar of its directory, so
+    M(nixknight.kubernetes.talos_asset_record) does not read it again.
+  - Destinations that already exist are left alone, like M(ansible.builtin.get_url)
+    without C(force). Several destinations with the same URL are downloaded
+    once; the others are hardlinked to it (falling back to a reflink, then a
+    copy, across filesystems).
+  - Supports C(check_mode); nothing is downloaded.
+options:
+  downloads:
+    description:
+      - Assets to download.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      url:
+        description:
+          - HTTP(S) URL of the asset.
+        required: true
+        type: str
+      dest:
+        description:
+          - Absolute path the asset is written to. Its directory must exist.
+        required: true
+        type: path
+      checksum:
+        description:
+          - Expected sha256 (hex) of the asset. A mismatch discards the
+            download and counts as a failed attempt. An existing O(downloads[].dest)
+            that does not match is downloaded again.
+        required: false
+        type: str
+  workers:
+    description:
+      - Maximum number of downloads in flight at the same time.
+    required: false
+    type: int
+    default: 4
+  retries:
+    description:
+      - Additional attempts per asset after a failed one. Each attempt resumes
+        from the bytes already received.
+    required: false
+    type: int
+    default: 3
+  delay:
+    description:
+      - Seconds to wait between attempts.
+    required: false
+    type: int
+    default: 10
+  timeout:
+    description:
+      - Socket timeout in seconds for connecting and for each read.
+    required: false
+    type: int
+    default: 1200
+  validate_certs:
+    description:
+      - Verify TLS certificates of HTTPS URLs.
+    required: false
+    type: bool
+    default: true
+  mode:
+    description:
+      - Mode applied to downloaded files.
+    required: false
+    type: raw
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Download the ISO and iPXE script of two profiles
+  nixknight.kubernetes.talos_factory_download:
+    workers: 4
+    mode: "0644"
+    downloads:
+      - url: "https://factory.talos.dev/image/{{ schematic_id }}/v1.12.7/metal-amd64.iso"
+        dest: /srv/talos-images/control-plane/metal-amd64.iso
+      - url: "https://factory.talos.dev/image/{{ schematic_id }}/v1.12.7/metal-amd64.iso"
+        dest: /srv/talos-images/worker/metal-amd64.iso
+      - url: "https://factory.talos.dev/pxe/{{ schematic_id }}/v1.12.7/metal-amd64"
+        dest: /srv/talos-images/worker/ipxe-amd64.ipxe
+
+- name: Test against a local server standing in for the Factory
+  nixknight.kubernetes.talos_factory_download:
+    downloads:
+      - url: http://127.0.0.1:8080/image/abc/v1.12.7/metal-amd64.iso
+        dest: /tmp/talos/metal-amd64.iso
+        checksum: "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+    retries: 0
+'''
+
+RETURN = r'''
+changed:
+  description: Whether any asset was downloaded or linked.
+  type: bool
+  returned: always
+downloads:
+  description: Per-asset results, in the order the assets were given.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    url:
+      description: The asset URL.
+      type: str
+    dest:
+      description: The destination path.
+      type: str
+    changed:
+      description: Whether the destination was written by this run.
+      type: bool
+    method:
+      description:
+        - How the destination was produced; C(download), C(hardlink),
+          C(reflink) or C(copy). C(null) when it already existed.
+      type: str
+    resumed_from:
+      description: Bytes of a partial file the download resumed from.
+      type: int
+    size:
+      description: Size of the asset in bytes, when written by this run.
+      type: int
+    sha256:
+      description: Hex sha256 computed while streaming, when written by this run.
+      type: str
+    attempts:
+      description: Number of download attempts made.
+      type: int
+    elapsed:
+      description: Seconds spent on this asset.
+      type: float
+    failed:
+      description: Whether the asset could not be downloaded.
+      type: bool
+    msg:
+      description: Error of the last failed attempt.
+      type: str
+      returned: when failed
+downloaded_bytes:
+  description: Bytes received over the network by this run.
+  type: int
+  returned: always
+elapsed:
+  description: Wall-clock seconds for the whole batch.
+  type: float
+  returned: always
+'''
+
+import hashlib
+import os
+import re
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.six.moves.http_client import HTTPException
+from ansible.module_utils.six.moves.urllib.error import HTTPError, URLError
+from ansible.module_utils.urls import ConnectionError, SSLValidationError, open_url
+
+from ansible_collections.nixknight.kubernetes.plugins.module_utils.talos_assets import (
+    CHUNK_SIZE,
+    asset_record,
+    link_or_copy,
+    read_sidecar,
+    record_is_current,
+    sha256_file,
+    update_sidecar,
+)
+
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Client errors other than these will not go away on a retry.
+RETRYABLE_HTTP_CODES = (408, 425, 429)
+
+
+class DownloadError(Exception):
+    """An attempt failed; the partial file (if any) is kept for resume."""
+
+
+def _fetch(url, part_path, timeout, validate_certs):
+    """Stream url into part_path, resuming it if present.
+
+    Returns (resumed_from, received, size, sha256).
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    digest = hashlib.sha256()
+    headers = {}
+    if offset:
+        with open(part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        headers['Range'] = 'bytes=%d-' % offset
+
+    try:
+        response = open_url(url, headers=headers, timeout=timeout, validate_certs=validate_certs)
+    except HTTPError as exc:
+        if exc.code == 416 and offset:
+            # The partial file is no prefix of what the server has now
+            os.unlink(part_path)
+            raise DownloadError("server refused to resume at byte %d; restarting" % offset)
+        raise
+
+    total = None
+    if offset and response.getcode() == 206:
+        match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range') or '')
+        if not match or int(match.group(1)) != offset:
+            os.unlink(part_path)
+            raise DownloadError("unexpected Content-Range %r; restarting"
+                                % response.headers.get('Content-Range'))
+        if match.group(3) != '*':
+            total = int(match.group(3))
+        file_mode = 'ab'
+    else:
+        # Full body: the server ignored the Range header or there was none
+        offset = 0
+        digest = hashlib.sha256()
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit():
+            total = int(length)
+        file_mode = 'wb'
+
+    received = 0
+    with open(part_path, file_mode) as f:
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b''):
+            f.write(chunk)
+            digest.update(chunk)
+            received += len(chunk)
+    response.close()
+
+    size = offset + received
+    if total is not None and size != total:
+        raise DownloadError("connection closed after %d of %d bytes" % (size, total))
+    return offset, received, size, digest.hexdigest()
+
+
+def download_asset(url, dest, checksum, retries, delay, timeout, validate_certs, mode):
+    """Download one asset to dest with resumable, hash-checked attempts."""
+    result = dict(url=url, dest=dest, changed=False, method=None, resumed_from=0,
+                  size=None, sha256=None, attempts=0, elapsed=0.0, failed=False,
+                  received=0)
+    part_path = dest + '.part'
+    started = time.time()
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(delay)
+        result['attempts'] = attempt + 1
+        try:
+            resumed_from, received, size, sha256 = _fetch(url, part_path, timeout, validate_certs)
+            result['received'] += received
+            if checksum and sha256 != checksum:
+                os.unlink(part_path)
+                raise DownloadError("sha256 %s does not match the expected %s" % (sha256, checksum))
+        except HTTPError as exc:
+            result['msg'] = "HTTP %s: %s" % (exc.code, exc.reason)
+            if 400 <= exc.code < 500 and exc.code not in RETRYABLE_HTTP_CODES:
+                break
+            continue
+        except (DownloadError, URLError, ConnectionError, SSLValidationError,
+                HTTPException, socket.timeout, IOError, OSError) as exc:
+            # HTTPException covers IncompleteRead: the body ended early
+            result['msg'] = str(exc)
+            continue
+
+        if mode is not None:
+            os.chmod(part_path, mode)
+        os.replace(part_path, dest)
+        result.update(changed=True, method='download', resumed_from=resumed_from,
+                      size=size, sha256=sha256)
+        result.pop('msg', None)
+        break
+
+    if 'msg' in result:
+        result['failed'] = True
+        result['msg'] = "Failed to download %s after %d attempt(s): %s" % (
+            url, result['attempts'], result['msg'])
+    result['elapsed'] = round(time.time() - started, 3)
+    return result
+
+
+def _is_present(dest, checksum):
+    """Whether dest exists and, when a checksum is expected, matches it.
+
+    A current sidecar record stands in for hashing the file again.
+    """
+    if not os.path.isfile(dest):
+        return False
+    if not checksum:
+        return True
+    record = read_sidecar(os.path.dirname(dest)).get(os.path.basename(dest))
+    if record_is_current(dest, record):
+        return record['sha256'] == checksum
+    return sha256_file(dest) == checksum
+
+
+def fetch_group(module, url, items):
+    """Download one URL once and place it at every destination that lacks it."""
+    params = module.params
+    results = dict((item['dest'], dict(url=url, dest=item['dest'], changed=False, method=None,
+                                       resumed_from=0, size=None, sha256=None, attempts=0,
+                                       elapsed=0.0, failed=False, received=0))
+                   for item in items)
+    missing = [item for item in items if not _is_present(item['dest'], item['checksum'])]
+    if not missing:
+        return results
+    if module.check_mode:
+        for item in missing:
+            results[item['dest']].update(changed=True, method='download')
+        return results
+
+    present = [item['dest'] for item in items if item not in missing]
+    if present:
+        source = present[0]
+    else:
+        first = missing.pop(0)
+        results[first['dest']] = download_asset(
+            url, first['dest'], first['checksum'], params['retries'], params['delay'],
+            params['timeout'], params['validate_certs'], params['mode'])
+        if results[first['dest']]['failed']:
+            for item in missing:
+                results[item['dest']].update(failed=True, msg=results[first['dest']]['msg'])
+            return results
+        source = first['dest']
+
+    source_sha256 = results[source]['sha256']
+    if not source_sha256:
+        record = read_sidecar(os.path.dirname(source)).get(os.path.basename(source))
+        if record_is_current(source, record):
+            source_sha256 = record['sha256']
+    for item in missing:
+        result = results[item['dest']]
+        started = time.time()
+        try:
+            if item['checksum']:
+                source_sha256 = source_sha256 or sha256_file(source)
+                if source_sha256 != item['checksum']:
+                    raise DownloadError("sha256 %s of %s does not match the expected %s"
+                                        % (source_sha256, source, item['checksum']))
+            result['method'] = link_or_copy(source, item['dest'], params['mode'])
+            result.update(changed=True, size=os.path.getsize(item['dest']), sha256=source_sha256)
+        except (DownloadError, IOError, OSError) as exc:
+            result.update(failed=True, msg="Failed to place %s at %s: %s" % (url, item['dest'], exc))
+        result['elapsed'] = round(time.time() - started, 3)
+    return results
+
+
+def record_downloads(downloads):
+    """Record the hash of every written file in its directory's sidecar."""
+    by_directory = {}
+    for item in downloads:
+        if item['changed'] and item['sha256']:
+            by_directory.setdefault(os.path.dirname(item['dest']), {})[
+                os.path.basename(item['dest'])] = asset_record(item['dest'], item['sha256'])
+    errors = []
+    for directory, records in by_directory.items():
+        try:
+            update_sidecar(directory, records)
+        except (IOError, OSError) as exc:
+            errors.append("Failed to record asset hashes in %s: %s" % (directory, exc))
+    return errors
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            downloads=dict(
+                type='list',
+                elements='dict',
+                required=True,
+                options=dict(
+                    url=dict(type='str', required=True),
+                    dest=dict(type='path', required=True),
+                    checksum=dict(type='str', required=False, default=None),
+                ),
+            ),
+            workers=dict(type='int', default=4),
+            retries=dict(type='int', default=3),
+            delay=dict(type='int', default=10),
+            timeout=dict(type='int', default=1200),
+            validate_certs=dict(type='bool', default=True),
+            mode=dict(type='raw', required=False, default=None),
+        ),
+        supports_check_mode=True,
+    )
+
+    downloads = module.params['downloads']
+    if module.params['workers'] < 1:
+        module.fail_json(msg="workers must be at least 1")
+    if module.params['retries'] < 0 or module.params['delay'] < 0:
+        module.fail_json(msg="retries and delay must not be negative")
+
+    mode = module.params['mode']
+    if isinstance(mode, str):
+        try:
+            module.params['mode'] = int(mode, 8)
+        except ValueError:
+            module.fail_json(msg="mode must be an octal string or integer: %r" % (mode,))
+
+    groups = {}
+    seen = set()
+    for item in downloads:
+        if not item['url'].startswith(('http://', 'https://')):
+            module.fail_json(msg="url must be http:// or https://: %r" % (item['url'],))
+        if not os.path.isabs(item['dest']):
+            module.fail_json(msg="dest must be an absolute path: %r" % (item['dest'],))
+        if item['dest'] in seen:
+            module.fail_json(msg="dest listed more than once: %s" % item['dest'])
+        seen.add(item['dest'])
+        if item['checksum']:
+            item['checksum'] = item['checksum'].lower()
+            if not SHA256_RE.match(item['checksum']):
+                module.fail_json(msg="checksum must be a hex sha256: %r" % (item['checksum'],))
+        if not module.check_mode and not os.path.isdir(os.path.dirname(item['dest'])):
+            module.fail_json(msg="directory of dest does not exist: %s" % item['dest'])
+        groups.setdefault(item['url'], []).append(item)
+
+    started = time.time()
+    results = {}
+    workers = min(module.params['workers'], max(1, len(groups)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for group_results in executor.map(lambda group: fetch_group(module, group[0], group[1]),
+                                          groups.items()):
+            results.update(group_results)
+
+    result = dict(
+        changed=False,
+        downloads=[results[item['dest']] for item in downloads],
+        downloaded_bytes=sum(item.pop('received') for item in results.values()),
+        elapsed=round(time.time() - started, 3),
+    )
+    result['changed'] = any(item['changed'] for item in result['downloads'])
+
+    failed = [item['msg'] for item in result['downloads'] if item['failed']]
+    if not module.check_mode:
+        failed.extend(record_downloads(result['downloads']))
+    if failed:
+        module.fail_json(msg="; ".join(failed), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: talos_usb_write
+short_description: Write a Talos boot image to a block device and verify it by reading it back
+version_added: "0.1.2"
+description:
+  - Stream an ISO, or a C(.raw.xz) disk image through an in-process xz
+    decompressor, onto a block device in large page-aligned blocks, opened
+    with C(O_DIRECT) so the data bypasses the page cache (falling back to
+    buffered I/O where direct I/O is not supported).
+  - With O(skip_identical), each block is first read from the device and only
+    written if it differs, so re-flashing a stick with the same image reads
+    it instead of rewriting it.
+  - With O(verify), the written range is read back after an C(fsync) and its
+    sha256 compared with the sha256 of the image streamed in; a mismatch fails
+    the task.
+  - This module performs NO safety checks on O(dest). It overwrites whatever
+    it is given; run it only behind the caller's own device guards.
+  - A regular file may stand in for the device (for example to test against
+    a plain file or a loop device's backing file). It must already exist; it
+    is written in place and not truncated.
+  - Supports C(check_mode); the device is opened read-only and the module
+    reports how many bytes differ from the image.
+options:
+  src:
+    description:
+      - Image to write.
+    required: true
+    type: path
+  dest:
+    description:
+      - Block device (or existing regular file) to write to.
+    required: true
+    type: path
+  decompress:
+    description:
+      - C(xz) streams O(src) through an xz decompressor, C(none) writes it
+        as-is, C(auto) picks C(xz) for a C(.xz) suffix.
+    required: false
+    type: str
+    choices: [auto, none, xz]
+    default: auto
+  block_size:
+    description:
+      - Bytes per read/compare/write. Must be a multiple of 4096 for direct
+        I/O.
+    required: false
+    type: int
+    default: 4194304
+  skip_identical:
+    description:
+      - Compare each block with the device and skip writing identical blocks.
+    required: false
+    type: bool
+    default: true
+  verify:
+    description:
+      - Read the written range back and compare its sha256 with the image.
+    required: false
+    type: bool
+    default: true
+  direct:
+    description:
+      - Use C(O_DIRECT) for device I/O when the device supports it.
+    required: false
+    type: bool
+    default: true
+author:
+  - Saad Ali (@NIXKnight)
+'''
+
+EXAMPLES = r'''
+- name: Write the worker ISO to a USB stick
+  nixknight.kubernetes.talos_usb_write:
+    src: /srv/talos-images/worker/metal-amd64.iso
+    dest: /dev/sdb
+  become: true
+  register: usb
+
+- name: Write a raw image, decompressing it on the fly
+  nixknight.kubernetes.talos_usb_write:
+    src: /srv/talos-images/worker/metal-amd64.raw.xz
+    dest: /dev/sdb
+  become: true
+
+- name: Try it out against a plain file
+  nixknight.kubernetes.talos_usb_write:
+    src: /srv/talos-images/worker/metal-amd64.iso
+    dest: /tmp/fake-usb.img
+'''
+
+RETURN = r'''
+changed:
+  description: Whether any block was written (or, in check mode, differs).
+  type: bool
+  returned: always
+image_bytes:
+  description: Size of the (decompressed) image.
+  type: int
+  returned: always
+written_bytes:
+  description: Bytes written to the device; in check mode, bytes that differ.
+  type: int
+  returned: always
+skipped_bytes:
+  description: Bytes left alone because the device already held them.
+  type: int
+  returned: always
+sha256:
+  description: Hex sha256 of the (decompressed) image.
+  type: str
+  returned: always
+verified:
+  description: Whether the read-back sha256 matched. C(null) when not verified.
+  type: bool
+  returned: always
+direct_io:
+  description:
+    - Whether the device was opened with C(O_DIRECT). An unaligned final
+      block is always written through the page cache.
+  type: bool
+  returned: always
+write_seconds:
+  description: Seconds spent streaming, comparing and writing, including the final fsync.
+  type: float
+  returned: always
+write_bytes_per_second:
+  description: Image bytes processed per second in the write pass.
+  type: int
+  returned: always
+verify_seconds:
+  description: Seconds spent reading the device back.
+  type: float
+  returned: always
+verify_bytes_per_second:
+  description: Bytes read back per second in the verify pass.
+  type: int
+  returned: always
+'''
+
+import errno
+import fcntl
+import hashlib
+import lzma
+import mmap
+import os
+import stat
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Covers both 512-byte and 4K logical sectors.
+DIRECT_IO_ALIGNMENT = 4096
+
+
+def _fill(reader, view):
+    """Read into view until it is full or the source ends; return the bytes read."""
+    filled = 0
+    while filled < len(view):
+        count = reader.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def _aligned(length):
+    """Round length up to the direct I/O alignment."""
+    return -(-length // DIRECT_IO_ALIGNMENT) * DIRECT_IO_ALIGNMENT
+
+
+class BlockDevice(object):
+    """Positional I/O on the target with O_DIRECT where it is accepted."""
+
+    def __init__(self, path, writable, direct):
+        flags = os.O_RDWR if writable else os.O_RDONLY
+        self.direct = False
+        if direct and hasattr(os, 'O_DIRECT'):
+            try:
+                self.fd = os.open(path, flags | os.O_DIRECT)
+                self.direct = True
+            except OSError as exc:
+                if exc.errno != errno.EINVAL:
+                    raise
+        if not self.direct:
+            self.fd = os.open(path, flags)
+        self.opened_direct = self.direct
+
+    def size(self):
+        return os.lseek(self.fd, 0, os.SEEK_END)
+
+    def buffered(self):
+        """Drop O_DIRECT, for the unaligned tail or a filesystem that refuses it."""
+        if self.direct:
+            fcntl.fcntl(self.fd, fcntl.F_SETFL, fcntl.fcntl(self.fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+            self.direct = False
+
+    def read(self, view, offset):
+        """Read into view at offset; aligned reads may run past the image end."""
+        try:
+            return os.preadv(self.fd, [view], offset)
+        except OSError as exc:
+            if exc.errno != errno.EINVAL or not self.direct:
+                raise
+            self.buffered()
+            return os.preadv(self.fd, [view], offset)
+
+    def write(self, view, offset):
+        if self.direct and len(view) % DIRECT_IO_ALIGNMENT:
+            self.buffered()
+        while len(view):
+            try:
+                count = os.pwritev(self.fd, [view], offset)
+            except OSError as exc:
+                if exc.errno != errno.EINVAL or not self.direct:
+                    raise
+                self.buffered()
+                continue
+            view = view[count:]
+            offset += count
+
+    def drop_cache(self):
+        """Make the verify pass read the medium, not the page cache."""
+        if not self.direct:
+            os.posix_fadvise(self.fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def write_image(reader, device, block_size, skip_identical, check_mode):
+    """Stream the image onto the device; return (image_bytes, written, skipped, sha256)."""
+    # Anonymous mappings are page-aligned, as O_DIRECT requires
+    block_view = memoryview(mmap.mmap(-1, block_size))
+    current_view = memoryview(mmap.mmap(-1, block_size))
+    digest = hashlib.sha256()
+    offset = written = skipped = 0
+    while True:
+        count = _fill(reader, block_view)
+        if not count:
+            break
+        data = block_view[:count]
+        digest.update(data)
+        if skip_identical or check_mode:
+            read = device.read(current_view[:_aligned(count)], offset)
+            if read >= count and current_view[:count] == data:
+                skipped += count
+                offset += count
+                continue
+        if not check_mode:
+            device.write(data, offset)
+        written += count
+        offset += count
+    if written and not check_mode:
+        os.fsync(device.fd)
+    return offset, written, skipped, digest.hexdigest()
+
+
+def read_back(device, length, block_size):
+    """Return the sha256 of the first length bytes of the device."""
+    view = memoryview(mmap.mmap(-1, block_size))
+    digest = hashlib.sha256()
+    offset = 0
+    while offset < length:
+        count = min(block_size, length - offset)
+        read = device.read(view[:_aligned(count)], offset)
+        if read < count:
+            raise IOError(errno.EIO, "short read at byte %d of %d" % (offset + read, length))
+        digest.update(view[:count])
+        offset += count
+    return digest.hexdigest()
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            src=dict(type='path', required=True),
+            dest=dict(type='path', required=True),
+            decompress=dict(type='str', choices=['auto', 'none', 'xz'], default='auto'),
+            block_size=dict(type='int', default=4 * 1024 * 1024),
+            skip_identical=dict(type='bool', default=True),
+            verify=dict(type='bool', default=True),
+            direct=dict(type='bool', default=True),
+        ),
+        supports_check_mode=True,
+    )
+
+    src = module.params['src']
+    dest = module.params['dest']
+    block_size = module.params['block_size']
+    if block_size < DIRECT_IO_ALIGNMENT or block_size % DIRECT_IO_ALIGNMENT:
+        module.fail_json(msg="block_size must be a positive multiple of %d" % DIRECT_IO_ALIGNMENT)
+    if not os.path.isfile(src):
+        module.fail_json(msg="src does not exist or is not a regular file: %s" % src)
+    try:
+        mode = os.stat(dest).st_mode
+    except OSError as exc:
+        module.fail_json(msg="Cannot stat dest %s: %s" % (dest, exc))
+    if not (stat.S_ISBLK(mode) or stat.S_ISREG(mode)):
+        module.fail_json(msg="dest must be a block device or a regular file: %s" % dest)
+
+    decompress = module.params['decompress']
+    if decompress == 'auto':
+        decompress = 'xz' if src.endswith('.xz') else 'none'
+
+    result = dict(changed=False, verified=None, verify_seconds=0.0, verify_bytes_per_second=0)
+    try:
+        device = BlockDevice(dest, not module.check_mode, module.params['direct'])
+    except OSError as exc:
+        module.fail_json(msg="Failed to open %s: %s" % (dest, exc))
+
+    try:
+        if decompress == 'none' and stat.S_ISBLK(mode) and os.path.getsize(src) > device.size():
+            module.fail_json(msg="%s (%d bytes) does not fit on %s (%d bytes)"
+                             % (src, os.path.getsize(src), dest, device.size()))
+
+        started = time.time()
+        reader = lzma.open(src, 'rb') if decompress == 'xz' else open(src, 'rb', buffering=0)
+        try:
+            image_bytes, written, skipped, sha256 = write_image(
+                reader, device, block_size, module.params['skip_identical'], module.check_mode)
+        finally:
+            reader.close()
+        elapsed = time.time() - started
+        result.update(
+            changed=written > 0,
+            image_bytes=image_bytes,
+            written_bytes=written,
+            skipped_bytes=skipped,
+            sha256=sha256,
+            direct_io=device.opened_direct,
+            write_seconds=round(elapsed, 3),
+            write_bytes_per_second=int(image_bytes / elapsed) if elapsed else 0,
+        )
+
+        if module.params['verify'] and not module.check_mode:
+            started = time.time()
+            device.drop_cache()
+            result['verified'] = read_back(device, image_bytes, block_size) == sha256
+            elapsed = time.time() - started
+            result['verify_seconds'] = round(elapsed, 3)
+            result['verify_bytes_per_second'] = int(image_bytes / elapsed) if elapsed else 0
+    except (IOError, OSError, lzma.LZMAError, EOFError) as exc:
+        module.fail_json(msg="Failed to write %s to %s: %s" % (src, dest, exc), **result)
+    finally:
+        device.close()
+
+    if result['verified'] is False:
+        module.fail_json(msg="Read-back verification of %s failed: the device does not hold %s"
+                         % (dest, src), **result)
+
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import os
+import threading
+
+import pytest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ansible_collections.nixknight.kubernetes.plugins.modules import talos_factory_download
+
+
+ASSET = os.urandom(256 * 1024 + 123)
+ASSET_SHA256 = hashlib.sha256(ASSET).hexdigest()
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    """Serve ASSET at any path, honouring open-ended Range requests.
+
+    The server's `truncate` counter makes that many responses stop halfway
+    through the body. With `chunked` set the body is sent with chunked
+    transfer encoding, so a cut shows up as IncompleteRead in the client
+    rather than as a short body.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(dict(path=self.path, range=self.headers.get('Range')))
+        offset = 0
+        if self.headers.get('Range'):
+            offset = int(self.headers['Range'][len('bytes='):].rstrip('-'))
+            if offset >= len(ASSET):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (offset, len(ASSET) - 1, len(ASSET)))
+        else:
+            self.send_response(200)
+        body = ASSET[offset:]
+        if self.server.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        truncated = self.server.truncate > 0
+        if truncated:
+            self.server.truncate -= 1
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        if not self.server.chunked:
+            self.wfile.write(body)
+            return
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(body), body))
+        if not truncated:
+            self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), AssetHandler)
+    httpd.requests = []
+    httpd.truncate = 0
+    httpd.chunked = False
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path='/image/metal-amd64.iso'):
+    return 'http://127.0.0.1:%d%s' % (server.server_address[1], path)
+
+
+def _download(url, dest, checksum=None, retries=0):
+    return talos_factory_download.download_asset(
+        url, dest, checksum, retries, 0, 10, False, None)
+
+
+class FakeModule(object):
+    """The attributes fetch_group reads from AnsibleModule."""
+
+    def __init__(self, check_mode=False):
+        self.check_mode = check_mode
+        self.params = dict(retries=0, delay=0, timeout=10, validate_certs=False, mode=None)
+
+
+def test_download_writes_asset_and_hash(server, tmp_path):
+    dest = str(tmp_path / 'metal-amd64.iso')
+
+    result = _download(_url(server), dest, ASSET_SHA256)
+
+    assert not result['failed']
+    assert result['changed'] and result['method'] == 'download'
+    assert result['sha256'] == ASSET_SHA256
+    assert result['size'] == len(ASSET)
+    with open(dest, 'rb') as f:
+        assert f.read() == ASSET
+    assert not os.path.exists(dest + '.part')
+
+
+def test_download_resumes_partial_file(server, tmp_path):
+    dest = str(tmp_path / 'metal-amd64.iso')
+    with open(dest + '.part', 'wb') as f:
+        f.write(ASSET[:1000])
+
+    result = _download(_url(server), dest, ASSET_SHA256)
+
+    assert not result['failed']
+    assert result['resumed_from'] == 1000
+    assert result['received'] == len(ASSET) - 1000
+    assert server.requests[-1]['range'] == 'bytes=1000-'
+    with open(dest, 'rb') as f:
+        assert f.read() == ASSET
+
+
+def test_download_retries_a_truncated_body_from_where_it_stopped(server, tmp_path):
+    dest = str(tmp_path / 'metal-amd64.iso')
+    server.truncate = 1
+
+    result = _download(_url(server), dest, ASSET_SHA256, retries=1)
+
+    assert not result['failed'], result.get('msg')
+    assert result['attempts'] == 2
+    assert result['resumed_from'] == len(ASSET) // 2
+    assert [request['range'] for request in server.requests] == [None, 'bytes=%d-' % (len(ASSET) // 2)]
+    with open(dest, 'rb') as f:
+        assert f.read() == ASSET
+
+
+def test_download_retries_an_incomplete_chunked_body(server, tmp_path):
+    dest = str(tmp_path / 'metal-amd64.iso')
+    server.chunked = True
+    server.truncate = 1
+
+    result = _download(_url(server), dest, ASSET_SHA256, retries=1)
+
+    assert not result['failed'], result.get('msg')
+    assert result['attempts'] == 2
+    with open(dest, 'rb') as f:
+        assert f.read() == ASSET
+
+
+def test_download_checksum_mismatch_fails_without_dest(server, tmp_path):
+    dest = str(tmp_path / 'metal-amd64.iso')
+
+    result = _download(_url(server), dest, '0' * 64)
+
+    assert result['failed']
+    assert 'does not match' in result['msg']
+    assert not os.path.exists(dest)
+    assert not os.path.exists(dest + '.part')
+
+
+def test_fetch_group_downloads_once_and_hardlinks_the_rest(server, tmp_path):
+    first = tmp_path / 'control-plane'
+    second = tmp_path / 'worker'
+    first.mkdir()
+    second.mkdir()
+    items = [
+        dict(dest=str(first / 'metal-amd64.iso'), checksum=ASSET_SHA256),
+        dict(dest=str(second / 'metal-amd64.iso'), checksum=None),
+    ]
+
+    results = talos_factory_download.fetch_group(FakeModule(), _url(server), items)
+
+    assert len(server.requests) == 1
+    assert results[items[0]['dest']]['method'] == 'download'
+    assert results[items[1]['dest']]['method'] == 'hardlink'
+    assert results[items[1]['dest']]['sha256'] == ASSET_SHA256
+    assert os.stat(items[0]['dest']).st_ino == os.stat(items[1]['dest']).st_ino
+
+
+def test_fetch_group_skips_present_assets_in_check_mode(server, tmp_path):
+    dest = tmp_path / 'metal-amd64.iso'
+    dest.write_bytes(ASSET)
+    missing = str(tmp_path / 'other' / 'metal-amd64.iso')
+    items = [dict(dest=str(dest), checksum=ASSET_SHA256), dict(dest=missing, checksum=None)]
+
+    results = talos_factory_download.fetch_group(FakeModule(check_mode=True), _url(server), items)
+
+    assert not server.requests
+    assert not results[str(dest)]['changed']
+    assert results[missing]['changed']
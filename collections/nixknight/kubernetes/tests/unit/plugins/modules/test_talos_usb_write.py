@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import io
+import lzma
+import os
+
+import pytest
+
+from ansible_collections.nixknight.kubernetes.plugins.modules import talos_usb_write
+
+
+BLOCK_SIZE = 4 * talos_usb_write.DIRECT_IO_ALIGNMENT
+# Not a multiple of the block size or of the alignment, so the tail is unaligned
+IMAGE = os.urandom(5 * BLOCK_SIZE + 1234)
+IMAGE_SHA256 = hashlib.sha256(IMAGE).hexdigest()
+
+
+@pytest.fixture
+def target(tmp_path):
+    """A zeroed regular file, larger than the image, standing in for the device."""
+    path = tmp_path / 'usb.img'
+    path.write_bytes(b'\0' * (len(IMAGE) + 3 * BLOCK_SIZE))
+    return str(path)
+
+
+def _write(path, reader, skip_identical=True, check_mode=False, direct=True):
+    device = talos_usb_write.BlockDevice(path, not check_mode, direct)
+    try:
+        return talos_usb_write.write_image(reader, device, BLOCK_SIZE, skip_identical, check_mode)
+    finally:
+        device.close()
+
+
+def _contents(path, length=None):
+    with open(path, 'rb') as f:
+        return f.read(length)
+
+
+@pytest.mark.parametrize('direct', [True, False])
+def test_write_image_writes_and_hashes(target, direct):
+    image_bytes, written, skipped, sha256 = _write(target, io.BytesIO(IMAGE), direct=direct)
+
+    assert (image_bytes, written, skipped) == (len(IMAGE), len(IMAGE), 0)
+    assert sha256 == IMAGE_SHA256
+    contents = _contents(target)
+    assert contents[:len(IMAGE)] == IMAGE
+    # Written in place: the rest of the target is untouched and not truncated
+    assert contents[len(IMAGE):] == b'\0' * (3 * BLOCK_SIZE)
+
+
+def test_write_image_skips_identical_blocks(target):
+    _write(target, io.BytesIO(IMAGE))
+    changed = bytearray(IMAGE)
+    changed[2 * BLOCK_SIZE + 10] ^= 0xff
+
+    image_bytes, written, skipped, sha256 = _write(target, io.BytesIO(bytes(changed)))
+
+    assert written == BLOCK_SIZE
+    assert skipped == len(IMAGE) - BLOCK_SIZE
+    assert sha256 == hashlib.sha256(changed).hexdigest()
+    assert _contents(target, len(IMAGE)) == bytes(changed)
+
+
+def test_write_image_rewrites_everything_without_skip_identical(target):
+    _write(target, io.BytesIO(IMAGE))
+
+    image_bytes, written, skipped, sha256 = _write(target, io.BytesIO(IMAGE), skip_identical=False)
+
+    assert (written, skipped) == (len(IMAGE), 0)
+
+
+def test_write_image_check_mode_counts_differences_only(target):
+    image_bytes, written, skipped, sha256 = _write(target, io.BytesIO(IMAGE), check_mode=True)
+
+    assert written == len(IMAGE)
+    assert sha256 == IMAGE_SHA256
+    assert _contents(target) == b'\0' * (len(IMAGE) + 3 * BLOCK_SIZE)
+
+
+def test_write_image_streams_xz(target, tmp_path):
+    src = tmp_path / 'metal-amd64.raw.xz'
+    src.write_bytes(lzma.compress(IMAGE))
+
+    with lzma.open(str(src), 'rb') as reader:
+        image_bytes, written, skipped, sha256 = _write(target, reader)
+
+    assert image_bytes == len(IMAGE)
+    assert sha256 == IMAGE_SHA256
+    assert _contents(target, len(IMAGE)) == IMAGE
+
+
+def test_read_back_verifies_written_range(target):
+    _write(target, io.BytesIO(IMAGE))
+    device = talos_usb_write.BlockDevice(target, False, True)
+    try:
+        device.drop_cache()
+        assert talos_usb_write.read_back(device, len(IMAGE), BLOCK_SIZE) == IMAGE_SHA256
+    finally:
+        device.close()
+
+
+def test_read_back_detects_corruption(target):
+    _write(target, io.BytesIO(IMAGE))
+    with open(target, 'r+b') as f:
+        f.seek(len(IMAGE) - 1)
+        f.write(bytes([IMAGE[-1] ^ 0xff]))
+    device = talos_usb_write.BlockDevice(target, False, True)
+    try:
+        assert talos_usb_write.read_back(device, len(IMAGE), BLOCK_SIZE) != IMAGE_SHA256
+    finally:
+        device.close()
+
+
+def test_read_back_fails_on_short_device(tmp_path):
+    path = tmp_path / 'short.img'
+    path.write_bytes(IMAGE[:BLOCK_SIZE])
+    device = talos_usb_write.BlockDevice(str(path), False, False)
+    try:
+        with pytest.raises(IOError):
+            talos_usb_write.read_back(device, len(IMAGE), BLOCK_SIZE)
+    finally:
+        device.close()
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# Benchmark harness for the opentofu_output lookup plugin.
+#
+# Generates synthetic OpenTofu states of the requested sizes (plain, and encrypted with the
+# pbkdf2 key provider and AES-GCM at the requested iteration counts), serves them from a local
+# file, a local S3 stand-in and optionally a local PostgreSQL database, and runs
+# LookupModule.run() against each combination. Every combination runs in a fresh process so
+# the reported peak RSS belongs to that combination alone.
+#
+# Usage:
+#   python opentofu_output_bench.py
+#   python opentofu_output_bench.py --sizes 1KB,10MB --kdf-iterations 0,600000 --runs 50
+#   python opentofu_output_bench.py --backends file,s3,pg --pg-conn-string postgresql://localhost/bench
+#
+# The S3 backend uses moto's ThreadedMotoServer (pip install 'moto[server]') unless
+# --s3-endpoint-url points at an existing S3-compatible endpoint such as MinIO.
+
+import argparse
+import base64
+import concurrent.futures
+import hashlib
+import importlib.util
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+LOOKUP_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'plugins', 'lookup', 'opentofu_output.py')
+
+DEFAULT_SIZES = '1KB,100KB,1MB,10MB,100MB'
+DEFAULT_KDF_ITERATIONS = '0,100000'
+DEFAULT_BACKENDS = 'file,s3'
+DEFAULT_RUNS = 20
+
+ENC_PASSPHRASE = 'opentofu-output-bench-passphrase'
+ENC_KEY_PROVIDER_NAME = 'bench'
+OUTPUT_NAMES = ['vpc_id', 'subnet_ids', 'endpoint']
+S3_BUCKET = 'opentofu-output-bench'
+PG_SCHEMA = 'opentofu_output_bench'
+
+SIZE_UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+# Parse a size such as 512KB or 100MB into a number of bytes
+def parse_size(value):
+    value = value.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * SIZE_UNITS[unit])
+    return int(value)
+
+
+def format_size(num_bytes):
+    for unit in ('GB', 'MB', 'KB'):
+        if num_bytes >= SIZE_UNITS[unit]:
+            return f"{num_bytes / SIZE_UNITS[unit]:.1f}{unit}"
+    return f"{num_bytes}B"
+
+
+# Build a serialized plain state of roughly target_size bytes. Outputs come first, as OpenTofu
+# writes them, and the bulk of the document is managed resources.
+def generate_state(target_size):
+    header = json.dumps({
+        'version': 4,
+        'terraform_version': '1.8.0',
+        'serial': 1,
+        'lineage': 'opentofu-output-bench',
+        'outputs': {
+            'vpc_id': {'value': 'vpc-0123456789abcdef0', 'type': 'string'},
+            'subnet_ids': {'value': [f"subnet-{i:017x}" for i in range(6)], 'type': ['list', 'string']},
+            'endpoint': {'value': {'host': 'db.example.internal', 'port': 5432}, 'type': ['object', {'host': 'string', 'port': 'number'}]},
+        },
+    })[:-1] + ', "resources": ['
+    footer = '], "check_results": null}'
+
+    resources = []
+    size = len(header) + len(footer)
+    index = 0
+    while size < target_size:
+        resource_json = json.dumps({
+            'mode': 'managed',
+            'type': 'null_resource',
+            'name': f"r{index}",
+            'provider': 'provider["registry.opentofu.org/hashicorp/null"]',
+            'instances': [{
+                'schema_version': 0,
+                'attributes': {'id': str(index), 'triggers': {'payload': 'x' * 640, 'quoted': 'a "b" {c} [d]'}},
+                'sensitive_attributes': [],
+            }],
+        })
+        resources.append(resource_json)
+        size += len(resource_json) + 1
+        index += 1
+
+    return (header + ','.join(resources) + footer).encode('utf-8')
+
+
+# Encrypt a serialized state the way OpenTofu's pbkdf2 key provider and AES-GCM method do
+def encrypt_state(plain_state, iterations):
+    salt = os.urandom(32)
+    key = hashlib.pbkdf2_hmac('sha512', ENC_PASSPHRASE.encode('utf-8'), salt, iterations, dklen=32)
+    nonce = os.urandom(12)
+    ciphertext = AESGCM(key).encrypt(nonce, plain_state, None)
+    key_provider_metadata = {
+        'salt': base64.b64encode(salt).decode('ascii'),
+        'iterations': iterations,
+        'hash_function': 'sha512',
+        'key_length': 32,
+    }
+    return json.dumps({
+        'serial': 1,
+        'lineage': 'opentofu-output-bench',
+        'meta': {f"key_provider.pbkdf2.{ENC_KEY_PROVIDER_NAME}": base64.b64encode(json.dumps(key_provider_metadata).encode('utf-8')).decode('ascii')},
+        'encrypted_data': base64.b64encode(nonce + ciphertext).decode('ascii'),
+        'encryption_version': 'v0',
+    }).encode('utf-8')
+
+
+def load_lookup_plugin():
+    spec = importlib.util.spec_from_file_location('opentofu_output', LOOKUP_PLUGIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Counts the payload bytes the lookup receives from a remote backend: S3 object bodies (from the
+# Content-Length of every GetObject response, so a 304 counts as 0) and PostgreSQL result values
+# (serialized as they travel in the row). Local files are memory-mapped and not counted.
+class TransferCounter:
+    def __init__(self, plugin):
+        self.total = 0
+        self._plugin = plugin
+        self._instrumented_s3_clients = set()
+
+        pg_fetchall = plugin.LookupModule._pg_fetchall
+
+        def counting_pg_fetchall(lookup, *args, **kwargs):
+            rows = pg_fetchall(lookup, *args, **kwargs)
+            for row in rows:
+                for value in row.values():
+                    self.total += len(value) if isinstance(value, str) else len(json.dumps(value))
+            return rows
+
+        plugin.LookupModule._pg_fetchall = counting_pg_fetchall
+
+    def _count_s3_body(self, http_response, **kwargs):
+        if http_response.status_code == 200:
+            self.total += int(http_response.headers.get('content-length', 0))
+
+    # S3 clients are created lazily by the lookup, so hook any new ones before each run
+    def instrument_s3_clients(self):
+        for s3_client in self._plugin._s3_clients.values():
+            if id(s3_client) not in self._instrumented_s3_clients:
+                s3_client.meta.events.register('after-call.s3.GetObject', self._count_s3_body)
+                self._instrumented_s3_clients.add(id(s3_client))
+
+
+# Peak RSS of this process. On Linux VmHWM is used because, unlike ru_maxrss, it starts afresh
+# at exec and so does not include the parent's footprint at the time it spawned this worker.
+def peak_rss_bytes():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+# Run one benchmark case in the current (fresh) process and return its measurements. Unless
+# warm is set, the state and derived-key caches are cleared before every lookup so each run
+# pays for the full fetch, key derivation, decryption and parse, as the first lookup of an
+# Ansible task does.
+def run_case(case):
+    if case.get('env'):
+        os.environ.update(case['env'])
+    plugin = load_lookup_plugin()
+    counter = TransferCounter(plugin)
+    lookup = plugin.LookupModule()
+    lookup_kwargs = dict(case['lookup_kwargs'], cache_ttl=0 if not case['warm'] else plugin.STATE_CACHE_DEFAULT_TTL)
+
+    baseline_rss = peak_rss_bytes()
+    expected = lookup.run(OUTPUT_NAMES, **lookup_kwargs)
+
+    latencies = []
+    transferred = []
+    for _ in range(case['runs']):
+        if not case['warm']:
+            plugin._state_cache.clear()
+            plugin._derived_key_cache.clear()
+        counter.instrument_s3_clients()
+        transferred_before = counter.total
+        started = time.perf_counter()
+        result = lookup.run(OUTPUT_NAMES, **lookup_kwargs)
+        latencies.append(time.perf_counter() - started)
+        transferred.append(counter.total - transferred_before)
+        if result != expected:
+            raise RuntimeError(f"Lookup returned {result!r}, expected {expected!r}")
+
+    return {
+        'latencies': latencies,
+        'peak_rss': peak_rss_bytes(),
+        'baseline_rss': baseline_rss,
+        'bytes_transferred': statistics.median(transferred) if transferred else None,
+    }
+
+
+def start_s3(endpoint_url):
+    import boto3
+
+    server = None
+    if not endpoint_url:
+        try:
+            from moto.server import ThreadedMotoServer
+        except ImportError:
+            sys.exit("The S3 backend needs moto[server] installed, or --s3-endpoint-url pointing at an S3-compatible endpoint")
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+        os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+        os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+    s3_client = boto3.client('s3', region_name='us-east-1', endpoint_url=endpoint_url)
+    try:
+        s3_client.create_bucket(Bucket=S3_BUCKET)
+    except s3_client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    return server, s3_client, endpoint_url
+
+
+def start_pg(pg_conn_string):
+    import psycopg2
+
+    conn = psycopg2.connect(pg_conn_string)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {PG_SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {PG_SCHEMA}")
+        cur.execute(f"CREATE TABLE {PG_SCHEMA}.states (id bigserial PRIMARY KEY, name text, data text)")
+        cur.execute(f"CREATE UNIQUE INDEX states_by_name ON {PG_SCHEMA}.states (name)")
+    return conn
+
+
+# Store a state blob in the backend and return the lookup arguments that read it back
+def publish_state(backend, name, blob, work_dir, s3_client, pg_conn, args):
+    if backend == 'file':
+        path = os.path.join(work_dir, f"{name}.tfstate")
+        with open(path, 'wb') as f:
+            f.write(blob)
+        return {'state_file_path': path}
+    if backend == 's3':
+        s3_client.put_object(Bucket=S3_BUCKET, Key=f"{name}.tfstate", Body=blob)
+        lookup_kwargs = {'s3_bucket': S3_BUCKET, 'bucket_path': f"{name}.tfstate"}
+        if args.s3_cache_dir:
+            lookup_kwargs['s3_cache_dir'] = os.path.join(work_dir, 's3-cache')
+        return lookup_kwargs
+    with pg_conn.cursor() as cur:
+        cur.execute(f"INSERT INTO {PG_SCHEMA}.states (name, data) VALUES (%s, %s)", (name, blob.decode('utf-8')))
+    return {'pg_conn_string': args.pg_conn_string, 'pg_schema': PG_SCHEMA, 'pg_workspace': name}
+
+
+def print_results(results):
+    header = f"{'backend':<8} {'size':>8} {'kdf iters':>9} {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'peak rss':>9} {'+rss':>9} {'bytes/run':>10}"
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        bytes_transferred = format_size(result['bytes_transferred']) if result['backend'] != 'file' else 'n/a'
+        print(f"{result['backend']:<8} {format_size(result['size']):>8} {result['kdf_iterations'] or '-':>9} "
+              f"{result['p50'] * 1000:>10.2f} {result['p90'] * 1000:>10.2f} {result['p99'] * 1000:>10.2f} "
+              f"{format_size(result['peak_rss']):>9} {format_size(max(0, result['peak_rss'] - result['baseline_rss'])):>9} {bytes_transferred:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the opentofu_output lookup across backends, state sizes and encryption settings.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"Comma-separated state sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument('--kdf-iterations', default=DEFAULT_KDF_ITERATIONS,
+                        help=f"Comma-separated PBKDF2 iteration counts; 0 means an unencrypted state (default: {DEFAULT_KDF_ITERATIONS})")
+    parser.add_argument('--backends', default=DEFAULT_BACKENDS, help=f"Comma-separated backends out of file, s3, pg (default: {DEFAULT_BACKENDS})")
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help=f"Timed lookups per case (default: {DEFAULT_RUNS})")
+    parser.add_argument('--warm', action='store_true', help='Keep the state and derived-key caches between runs instead of clearing them')
+    parser.add_argument('--s3-endpoint-url', help='Use an existing S3-compatible endpoint instead of starting a moto server')
+    parser.add_argument('--s3-cache-dir', action='store_true', help='Enable the S3 disk cache (conditional GETs) for the S3 backend')
+    parser.add_argument('--pg-conn-string', help='PostgreSQL database to use for the pg backend; a scratch schema is created and dropped')
+    parser.add_argument('--json', dest='json_path', help='Also write the raw results to this file as JSON')
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    kdf_iterations = [int(iterations) for iterations in args.kdf_iterations.split(',')]
+    backends = [backend.strip() for backend in args.backends.split(',')]
+    unknown_backends = set(backends) - {'file', 's3', 'pg'}
+    if unknown_backends:
+        parser.error(f"Unknown backends: {', '.join(sorted(unknown_backends))}")
+    if 'pg' in backends and not args.pg_conn_string:
+        parser.error('The pg backend needs --pg-conn-string')
+
+    work_dir = tempfile.mkdtemp(prefix='opentofu-output-bench-')
+    s3_server = s3_client = pg_conn = None
+    case_env = {}
+    try:
+        if 's3' in backends:
+            s3_server, s3_client, endpoint_url = start_s3(args.s3_endpoint_url)
+            case_env = {
+                'AWS_ENDPOINT_URL_S3': endpoint_url,
+                'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'bench'),
+                'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'bench'),
+            }
+        if 'pg' in backends:
+            pg_conn = start_pg(args.pg_conn_string)
+
+        results = []
+        spawn = multiprocessing.get_context('spawn')
+        for size in sizes:
+            plain_state = generate_state(size)
+            for iterations in kdf_iterations:
+                blob = encrypt_state(plain_state, iterations) if iterations else plain_state
+                name = f"{format_size(size)}-{iterations}"
+                for backend in backends:
+                    lookup_kwargs = publish_state(backend, name, blob, work_dir, s3_client, pg_conn, args)
+                    if iterations:
+                        lookup_kwargs.update(enc_passphrase=ENC_PASSPHRASE, enc_key_provider_name=ENC_KEY_PROVIDER_NAME)
+                    case = {'lookup_kwargs': lookup_kwargs, 'runs': args.runs, 'warm': args.warm, 'env': case_env}
+
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                        measured = executor.submit(run_case, case).result()
+
+                    result = {
+                        'backend': backend,
+                        'size': len(plain_state),
+                        'stored_size': len(blob),
+                        'kdf_iterations': iterations,
+                        'p50': percentile(measured['latencies'], 50),
+                        'p90': percentile(measured['latencies'], 90),
+                        'p99': percentile(measured['latencies'], 99),
+                        **measured,
+                    }
+                    results.append(result)
+                    print(f"{backend} {name}: p50 {result['p50'] * 1000:.2f} ms", file=sys.stderr)
+                    if backend == 'file':
+                        os.unlink(lookup_kwargs['state_file_path'])
+
+        print_results(results)
+        if args.json_path:
+            with open(args.json_path, 'w') as f:
+                json.dump(results, f, indent=2)
+    finally:
+        if pg_conn is not None:
+            with pg_conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {PG_SCHEMA} CASCADE")
+            pg_conn.close()
+        if s3_server is not None:
+            s3_server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,257 @@
 from ansible.plugins.lookup import LookupBase
 from ansible.errors import AnsibleError
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.utils.display import Display
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import atexit
+import hashlib
 import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import base64
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import boto3
 from botocore.exceptions import ClientError
 
+display = Display()
+
+# Upper bound on the number of decrypted states kept in memory, and the default number of
+# seconds a cached state is served before its source is consulted again
+STATE_CACHE_MAX_ENTRIES = 32
+STATE_CACHE_DEFAULT_TTL = 300
+
+# Upper bound on the number of PBKDF2-derived keys kept in memory
+DERIVED_KEY_CACHE_MAX_ENTRIES = 16
+
+
+# Bounded LRU cache with a per-entry time-to-live, shared by every lookup in this process
+class BoundedCache:
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_state_cache = BoundedCache(STATE_CACHE_MAX_ENTRIES)
+_derived_key_cache = BoundedCache(DERIVED_KEY_CACHE_MAX_ENTRIES)
+atexit.register(_derived_key_cache.clear)
+
+# Ansible forks a worker process per host and task, and each inherits these module-level
+# maps from the controller. Clients and pools are therefore keyed on the pid that created
+# them: a worker never reuses the sockets it inherited, which its parent or siblings may be
+# using too. Inherited entries stay referenced so they are not closed on garbage collection,
+# which would end the parent's sessions over the shared sockets.
+
+# One S3 client per (pid, profile, region), reused by every lookup in that process
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
+# One connection pool per (pid, PostgreSQL connection string), kept while that process lives
+PG_POOL_MAX_CONNECTIONS = 8
+_pg_pools = {}
+_pg_pools_lock = threading.Lock()
+
+
+# Runs only in the process that registered it; forked workers leave via os._exit, and their
+# connections close with the process.
+def _close_pg_pools():
+    pid = os.getpid()
+    with _pg_pools_lock:
+        for key in [key for key in _pg_pools if key[0] == pid]:
+            _pg_pools.pop(key).closeall()
+
+
+atexit.register(_close_pg_pools)
+
+# Options a single state source can set when several are resolved with `sources`; anything a
+# source leaves out is inherited from the lookup's own keyword arguments. Sources are fetched
+# concurrently, with no more workers than a PostgreSQL pool has connections.
+SOURCE_OPTIONS = (
+    'state_file_path', 'pg_conn_string', 'pg_schema', 'pg_workspace', 's3_bucket', 'bucket_path',
+    'aws_region', 'aws_profile', 's3_cache_dir', 'enc_passphrase', 'enc_key_provider_name',
+    'cache_ttl', 'stream_parse'
+)
+SOURCES_MAX_WORKERS = PG_POOL_MAX_CONNECTIONS
+
+# The schema name is interpolated into the queries (unquoted, exactly as OpenTofu creates it),
+# so it is restricted to a plain identifier
+PG_SCHEMA_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_$]*$')
+
+# Top-level state members the lookup actually reads: `outputs` from a plain state, and the
+# key-provider metadata plus ciphertext from an encrypted one
+STATE_OUTPUT_MEMBERS = ('outputs',)
+ENCRYPTED_STATE_MEMBERS = ('meta', 'encrypted_data')
+
+# Byte-level JSON tokens used by the streaming state parser. Every pattern is applied with
+# match() at the current offset, so a malformed or truncated document fails where the scan
+# stands instead of being searched further, and each loop is unrolled so nothing backtracks.
+_JSON_WHITESPACE_RE = re.compile(rb'[ \t\n\r]*')
+_JSON_STRING_PATTERN = rb'"[^"\\\x00-\x1f]*(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})[^"\\\x00-\x1f]*)*"'
+_JSON_STRING_RE = re.compile(_JSON_STRING_PATTERN)
+_JSON_SCALAR_PATTERN = rb'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null'
+_JSON_TOKEN_RE = re.compile(
+    rb'[ \t\n\r]*(?:(' + _JSON_STRING_PATTERN + rb')|(' + _JSON_SCALAR_PATTERN + rb')'
+    rb'|([\[{])|([\]}])|(,)|(:))'
+)
+# Runs of further flat members after a value, taken in one match rather than token by token
+_JSON_LEAF_PATTERN = rb'[ \t\n\r]*(?:' + _JSON_STRING_PATTERN + rb'|' + _JSON_SCALAR_PATTERN + rb')'
+_JSON_RUN_RES = {
+    b']': re.compile(rb'(?:[ \t\n\r]*,' + _JSON_LEAF_PATTERN + rb')*'),
+    b'}': re.compile(rb'(?:[ \t\n\r]*,[ \t\n\r]*' + _JSON_STRING_PATTERN + rb'[ \t\n\r]*:' + _JSON_LEAF_PATTERN + rb')*'),
+}
+# Token kinds, by capture group, and the scanner's states between tokens
+_STRING, _SCALAR, _OPEN, _CLOSE, _COMMA, _COLON = range(1, 7)
+_VALUE, _VALUE_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COLON_DUE, _SEPARATOR = range(6)
+_JSON_CLOSERS = {b'{': b'}', b'[': b']'}
+
+
+def _skip_json_whitespace(buf, pos):
+    return _JSON_WHITESPACE_RE.match(buf, pos).end()
+
+
+# Return the offset just past the JSON value starting at pos without decoding it. The value is
+# checked token by token against the JSON grammar (bracket pairing, separators, string escapes
+# and scalar spelling), so anything json.loads rejects is rejected here too, in time linear in
+# the size of the value.
+def _skip_json_value(buf, pos):
+    closers = []
+    state = _VALUE
+    while True:
+        match = _JSON_TOKEN_RE.match(buf, pos)
+        if match is None:
+            raise json.JSONDecodeError("Unterminated or invalid value", '', _skip_json_whitespace(buf, pos))
+        kind = match.lastindex
+        token = match.group(kind)
+        token_pos = match.start(kind)
+        pos = match.end()
+
+        closes = kind == _CLOSE and bool(closers) and token == closers[-1]
+        if state in (_VALUE, _VALUE_OR_CLOSE):
+            if kind == _OPEN:
+                closers.append(_JSON_CLOSERS[token])
+                state = _KEY_OR_CLOSE if token == b'{' else _VALUE_OR_CLOSE
+                continue
+            if kind not in (_STRING, _SCALAR) and not (closes and state == _VALUE_OR_CLOSE):
+                raise json.JSONDecodeError("Expecting value", '', token_pos)
+        elif state in (_KEY, _KEY_OR_CLOSE):
+            if kind == _STRING:
+                state = _COLON_DUE
+                continue
+            if not (closes and state == _KEY_OR_CLOSE):
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", '', token_pos)
+        elif state == _COLON_DUE:
+            if kind != _COLON:
+                raise json.JSONDecodeError("Expecting ':' delimiter", '', token_pos)
+            state = _VALUE
+            continue
+        else:
+            if kind == _COMMA:
+                state = _KEY if closers[-1] == b'}' else _VALUE
+                continue
+            if not closes:
+                raise json.JSONDecodeError("Expecting ',' delimiter", '', token_pos)
+
+        # A scalar or string value was read, or the innermost container was closed
+        if kind == _CLOSE:
+            closers.pop()
+        if not closers:
+            return pos
+        pos = _JSON_RUN_RES[closers[-1]].match(buf, pos).end()
+        state = _SEPARATOR
+
+
+# Walk the top-level object of a serialized state and decode only the named members. Works on
+# bytes and memory maps alike, so nothing else in the document (notably `resources`) is ever
+# materialized. The whole object is still walked, so a truncated document or trailing data
+# fails as it would with json.loads, and a repeated member resolves to its last occurrence.
+def _scan_json_members(buf, members, pos=0):
+    spans = {}
+    pos = _skip_json_whitespace(buf, pos)
+    if buf[pos:pos + 1] != b'{':
+        raise json.JSONDecodeError("Expecting '{'", '', pos)
+    pos = _skip_json_whitespace(buf, pos + 1)
+
+    if buf[pos:pos + 1] == b'}':
+        pos += 1
+    else:
+        while True:
+            key_match = _JSON_STRING_RE.match(buf, pos)
+            if key_match is None:
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", '', pos)
+            key = json.loads(key_match.group())
+
+            pos = _skip_json_whitespace(buf, key_match.end())
+            if buf[pos:pos + 1] != b':':
+                raise json.JSONDecodeError("Expecting ':' delimiter", '', pos)
+            pos = _skip_json_whitespace(buf, pos + 1)
+
+            end = _skip_json_value(buf, pos)
+            if key in members:
+                spans[key] = (pos, end)
+
+            pos = _skip_json_whitespace(buf, end)
+            delimiter = buf[pos:pos + 1]
+            if delimiter == b'}':
+                pos += 1
+                break
+            if delimiter != b',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", '', pos)
+            pos = _skip_json_whitespace(buf, pos + 1)
+
+    if _skip_json_whitespace(buf, pos) != len(buf):
+        raise json.JSONDecodeError("Extra data", '', pos)
+    return dict((key, json.loads(buf[start:end])) for key, (start, end) in spans.items())
+
+
+# Server-side output extraction for unencrypted states. The state is cast to jsonb once in the
+# inner query (OFFSET 0 keeps PostgreSQL from inlining it and re-parsing per output), and only
+# the requested output values are sent back.
+PG_REQUESTED_OUTPUTS_QUERY = """
+    SELECT s.outputs IS NOT NULL AS has_outputs,
+           (SELECT jsonb_object_agg(requested.name, s.outputs -> requested.name -> 'value')
+              FROM unnest(%s::text[]) AS requested(name)
+             WHERE s.outputs ? requested.name) AS outputs
+      FROM (SELECT data::jsonb -> 'outputs' AS outputs FROM {schema}.states WHERE name = %s OFFSET 0) AS s
+"""
+PG_ALL_OUTPUTS_QUERY = """
+    SELECT s.outputs IS NOT NULL AS has_outputs,
+           (SELECT jsonb_object_agg(o.key, o.value -> 'value')
+              FROM jsonb_each(s.outputs) AS o) AS outputs
+      FROM (SELECT data::jsonb -> 'outputs' AS outputs FROM {schema}.states WHERE name = %s OFFSET 0) AS s
+"""
+
+
 class LookupModule(LookupBase):
     # Extracts an output value from the OpenTofu state
     def _extract_output(self, opentofu_state, output_name):
@@ -19,7 +261,16 @@ class LookupModule(LookupBase):
         if output_name not in opentofu_state['outputs']:
             raise AnsibleError(f"Output '{output_name}' not found")
 
-        return [opentofu_state['outputs'][output_name]['value']]
+        return opentofu_state['outputs'][output_name]['value']
+
+    # Extracts every requested output from one state, or all outputs as a single dict
+    def _extract_outputs(self, opentofu_state, output_names, all_outputs):
+        if all_outputs:
+            if 'outputs' not in opentofu_state:
+                raise AnsibleError("No outputs found in state")
+            return [{name: output['value'] for name, output in opentofu_state['outputs'].items()}]
+
+        return [self._extract_output(opentofu_state, output_name) for output_name in output_names]
 
     # Extracts metadata and encrypted data from the encrypted state
     def _extract_metadata_and_encrypted_data(self, encrypted_state, enc_key_provider_name):
@@ -32,49 +283,117 @@ class LookupModule(LookupBase):
         except Exception as e:
             raise AnsibleError(f"Failed to extract metadata or encrypted data: {str(e)}")
 
+    # Digest of the passphrase and every PBKDF2 parameter, used to key the derived-key cache.
+    # Each part is length-prefixed so distinct inputs can never collide by concatenation.
+    def _derived_key_cache_key(self, enc_passphrase, salt, iterations, hash_function, key_length):
+        digest = hashlib.sha256()
+        for part in (enc_passphrase.encode('utf-8'), salt, str(iterations).encode('utf-8'),
+                     hash_function.encode('utf-8'), str(key_length).encode('utf-8')):
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    # Parse a serialized state (bytes or a memory map, starting at pos). In streaming mode only
+    # the named top-level members are decoded; otherwise the whole document is.
+    def _parse_state(self, buf, members, stream_parse, pos=0):
+        if stream_parse:
+            return _scan_json_members(buf, members, pos)
+        return json.loads(buf[pos:])
+
     # Decrypt OpenTofu state using the provided passphrase and metadata
-    def _decrypt_opentofu_state(self, enc_passphrase, encryption_metadata, encrypted_data):
-        pbkdf2_hash_function_map = {
-            'sha512': hashes.SHA512,
-            'sha256': hashes.SHA256
-        }
+    def _decrypt_opentofu_state(self, enc_passphrase, encryption_metadata, encrypted_data, stream_parse):
+        pbkdf2_metadata_algorithm = encryption_metadata['hash_function']
+        if pbkdf2_metadata_algorithm not in ('sha256', 'sha512'):
+            raise AnsibleError(f"Unsupported PBKDF2 hash function: {pbkdf2_metadata_algorithm}")
 
         pbkdf2_metadata_salt = base64.b64decode(encryption_metadata['salt'])
         pbkdf2_metadata_iterations = encryption_metadata['iterations']
-        pbkdf2_metadata_algorithm = pbkdf2_hash_function_map[encryption_metadata['hash_function']]
         pbkdf2_metadata_length = encryption_metadata['key_length']
 
-        pbkdf2_deriver = PBKDF2HMAC(
-            algorithm=pbkdf2_metadata_algorithm(),
-            length=pbkdf2_metadata_length,
-            salt=pbkdf2_metadata_salt,
-            iterations=pbkdf2_metadata_iterations
+        # Only the first decrypt with a given passphrase and key-provider metadata pays for the
+        # derivation; the cache is keyed on a digest so the passphrase itself is never stored
+        pbkdf2_cache_key = self._derived_key_cache_key(
+            enc_passphrase,
+            pbkdf2_metadata_salt,
+            pbkdf2_metadata_iterations,
+            pbkdf2_metadata_algorithm,
+            pbkdf2_metadata_length
         )
+        pbkdf2_derived_key = _derived_key_cache.get(pbkdf2_cache_key, float('inf'))
+
+        # hashlib releases the GIL while deriving, so sources resolved concurrently run their
+        # key derivations in parallel
+        if pbkdf2_derived_key is None:
+            pbkdf2_derived_key = hashlib.pbkdf2_hmac(
+                pbkdf2_metadata_algorithm,
+                enc_passphrase.encode('utf-8'),
+                pbkdf2_metadata_salt,
+                pbkdf2_metadata_iterations,
+                dklen=pbkdf2_metadata_length
+            )
+            _derived_key_cache.put(pbkdf2_cache_key, pbkdf2_derived_key)
 
-        pbkdf2_derived_key = pbkdf2_deriver.derive(enc_passphrase.encode('utf-8'))
         pbkdf2_nonce = encrypted_data[:12]
         pbkdf2_ciphertext = encrypted_data[12:]
 
         try:
             aesgcm = AESGCM(pbkdf2_derived_key)
             plaintext_state = aesgcm.decrypt(pbkdf2_nonce, pbkdf2_ciphertext, None)
-            return json.loads(plaintext_state.decode('utf-8'))
+            return self._parse_state(plaintext_state, STATE_OUTPUT_MEMBERS, stream_parse)
         except Exception as e:
             raise ValueError(f"Decryption failed: {str(e)}")
 
-    # Decrypt if necessary and retrieve the output
-    def _decrypt_state_if_needed(self, state, enc_passphrase, enc_key_provider_name, output_name):
+    # Decrypt the state if necessary
+    def _decrypt_state_if_needed(self, state, enc_passphrase, enc_key_provider_name, stream_parse):
         if enc_passphrase:
             metadata, encrypted_data = self._extract_metadata_and_encrypted_data(state, enc_key_provider_name)
-            state = self._decrypt_opentofu_state(enc_passphrase, metadata, encrypted_data)
-        return self._extract_output(state, output_name)
+            state = self._decrypt_opentofu_state(enc_passphrase, metadata, encrypted_data, stream_parse)
+        return state
+
+    # Builds the state cache key from the state location and its version marker. The passphrase
+    # is part of the key (as a digest, never in the clear) so a wrong passphrase never gets
+    # served a state that was decrypted with the right one.
+    def _state_cache_key(self, location, version, enc_passphrase, enc_key_provider_name):
+        passphrase_digest = hashlib.sha256(enc_passphrase.encode('utf-8')).hexdigest() if enc_passphrase else None
+        return (location, version, enc_key_provider_name, passphrase_digest)
+
+    # Serve the decrypted state from the cache, or load and decrypt it on a miss. Only the
+    # outputs are cached, as JSON text, so every hit decodes a fresh copy and a caller that
+    # changes the values it was handed cannot change what later lookups are served.
+    def _load_state_cached(self, cache_key, cache_ttl, load_state, enc_passphrase, enc_key_provider_name, stream_parse):
+        if cache_ttl > 0:
+            cached_state = _state_cache.get(cache_key, cache_ttl)
+            if cached_state is not None:
+                return json.loads(cached_state)
+
+        state = self._decrypt_state_if_needed(load_state(), enc_passphrase, enc_key_provider_name, stream_parse)
+        if cache_ttl > 0:
+            _state_cache.put(cache_key, json.dumps({member: state[member] for member in STATE_OUTPUT_MEMBERS if member in state}))
+        return state
+
+    # Members to decode from a raw state as stored by the backend
+    def _raw_state_members(self, enc_passphrase):
+        return ENCRYPTED_STATE_MEMBERS if enc_passphrase else STATE_OUTPUT_MEMBERS
+
+    # Read the state from a file and handle decryption if required. The file's mtime, size and
+    # inode are its version marker. The file is memory-mapped, so with streaming parsing it is
+    # paged in as it is scanned rather than read into memory whole.
+    def _get_state_from_file(self, state_file_path, enc_passphrase, enc_key_provider_name, cache_ttl, stream_parse):
+        def load_state():
+            with open(state_file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise json.JSONDecodeError("Expecting value", '', 0)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    return self._parse_state(buf, self._raw_state_members(enc_passphrase), stream_parse)
 
-    # Read the state from a file and handle decryption if required
-    def _get_state_from_file(self, state_file_path, enc_passphrase, enc_key_provider_name, output_name):
         try:
-            with open(state_file_path, 'r') as f:
-                state = json.load(f)
-            return self._decrypt_state_if_needed(state, enc_passphrase, enc_key_provider_name, output_name)
+            file_stat = os.stat(state_file_path)
+            cache_key = self._state_cache_key(
+                ('file', os.path.abspath(state_file_path)),
+                (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino),
+                enc_passphrase, enc_key_provider_name
+            )
+            return self._load_state_cached(cache_key, cache_ttl, load_state, enc_passphrase, enc_key_provider_name, stream_parse)
         except FileNotFoundError:
             raise AnsibleError(f"State file not found: {state_file_path}")
         except json.JSONDecodeError:
@@ -84,22 +403,93 @@ class LookupModule(LookupBase):
         except Exception as e:
             raise AnsibleError(f"Error processing state file: {str(e)}")
 
-    # Read the state from AWS S3 bucket and handle decryption if required
-    def _get_state_from_s3(self, s3_bucket, bucket_path, aws_region, aws_profile, enc_passphrase, enc_key_provider_name, output_name):
+    # Returns the S3 client for the profile and region, creating it on first use. boto3
+    # clients are thread-safe; sessions are not, so creation happens under the lock.
+    def _get_s3_client(self, aws_profile, aws_region):
+        with _s3_clients_lock:
+            key = (os.getpid(), aws_profile, aws_region)
+            s3_client = _s3_clients.get(key)
+            if s3_client is None:
+                # Initialize S3 client with optional profile
+                if aws_profile:
+                    session = boto3.Session(profile_name=aws_profile, region_name=aws_region)
+                    s3_client = session.client('s3')
+                else:
+                    s3_client = boto3.client('s3', region_name=aws_region)
+                _s3_clients[key] = s3_client
+            return s3_client
+
+    # Fetch the state blob through the on-disk cache. The cache file holds the ETag on its
+    # first line followed by the raw (still encrypted) blob, written atomically in one file so
+    # the two can never disagree. A conditional GET turns an unchanged state into a single
+    # 304 round-trip. Returns the current ETag and the path of the cached blob.
+    def _fetch_s3_state_with_disk_cache(self, s3_client, s3_bucket, bucket_path, s3_cache_dir):
+        os.makedirs(s3_cache_dir, mode=0o700, exist_ok=True)
+        cache_name = hashlib.sha256(f"{s3_bucket}/{bucket_path}".encode('utf-8')).hexdigest()
+        cache_path = os.path.join(s3_cache_dir, f"{cache_name}.tfstate")
+
+        cached_etag = None
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as f:
+                cached_etag = f.readline().decode('utf-8').rstrip('\n') or None
+
+        request = {'Bucket': s3_bucket, 'Key': bucket_path}
+        if cached_etag:
+            request['IfNoneMatch'] = cached_etag
+
         try:
-            # Initialize S3 client with optional profile
-            if aws_profile:
-                session = boto3.Session(profile_name=aws_profile, region_name=aws_region)
-                s3_client = session.client('s3')
-            else:
-                s3_client = boto3.client('s3', region_name=aws_region)
+            response = s3_client.get_object(**request)
+        except ClientError as e:
+            if cached_etag and e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == 304:
+                return cached_etag, cache_path
+            raise
+
+        etag = response['ETag']
+        fd, tmp_path = tempfile.mkstemp(dir=s3_cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(etag.encode('utf-8') + b'\n')
+                for chunk in response['Body'].iter_chunks():
+                    f.write(chunk)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return etag, cache_path
+
+    # Read the state from AWS S3 bucket and handle decryption if required. The object's ETag
+    # is its version marker: with s3_cache_dir it comes from the conditional GET, otherwise
+    # from a HEAD request.
+    def _get_state_from_s3(self, s3_bucket, bucket_path, aws_region, aws_profile, enc_passphrase, enc_key_provider_name, cache_ttl, s3_cache_dir, stream_parse):
+        try:
+            s3_client = self._get_s3_client(aws_profile, aws_region)
+            cache_location = ('s3', aws_profile, aws_region, s3_bucket, bucket_path)
+
+            if s3_cache_dir:
+                etag, cache_path = self._fetch_s3_state_with_disk_cache(s3_client, s3_bucket, bucket_path, s3_cache_dir)
+
+                # Read the cached blob back, skipping the ETag line
+                def load_state():
+                    with open(cache_path, 'rb') as f:
+                        blob_offset = len(f.readline())
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                            return self._parse_state(buf, self._raw_state_members(enc_passphrase), stream_parse, blob_offset)
+
+                cache_key = self._state_cache_key(cache_location, (etag,), enc_passphrase, enc_key_provider_name)
+                return self._load_state_cached(cache_key, cache_ttl, load_state, enc_passphrase, enc_key_provider_name, stream_parse)
 
             # Get the state file from S3
-            response = s3_client.get_object(Bucket=s3_bucket, Key=bucket_path)
-            state_content = response['Body'].read().decode('utf-8')
-            state = json.loads(state_content)
+            def load_state():
+                response = s3_client.get_object(Bucket=s3_bucket, Key=bucket_path)
+                state_content = response['Body'].read()
+                return self._parse_state(state_content, self._raw_state_members(enc_passphrase), stream_parse)
+
+            cache_key = None
+            if cache_ttl > 0:
+                head = s3_client.head_object(Bucket=s3_bucket, Key=bucket_path)
+                cache_key = self._state_cache_key(cache_location, (head.get('ETag'),), enc_passphrase, enc_key_provider_name)
 
-            return self._decrypt_state_if_needed(state, enc_passphrase, enc_key_provider_name, output_name)
+            return self._load_state_cached(cache_key, cache_ttl, load_state, enc_passphrase, enc_key_provider_name, stream_parse)
         except ClientError as e:
             raise AnsibleError(f"AWS S3 error: {str(e)}")
         except json.JSONDecodeError:
@@ -109,56 +499,206 @@ class LookupModule(LookupBase):
         except Exception as e:
             raise AnsibleError(f"Error processing state from S3: {str(e)}")
 
-    # Read the state from a PostgreSQL database and handle decryption if required
-    def _get_state_from_pg_db_schema(self, pg_conn_string, pg_schema, enc_passphrase, enc_key_provider_name, output_name):
+    # Returns this process's connection pool for the connection string, creating it on first use
+    def _get_pg_pool(self, pg_conn_string):
+        key = (os.getpid(), pg_conn_string)
+        with _pg_pools_lock:
+            pg_pool = _pg_pools.get(key)
+            if pg_pool is None:
+                pg_pool = ThreadedConnectionPool(0, PG_POOL_MAX_CONNECTIONS, pg_conn_string)
+                _pg_pools[key] = pg_pool
+            return pg_pool
+
+    # Run a query on a pooled connection and return all rows. Connections run in autocommit
+    # so they never sit idle in a transaction between lookups. A connection that died while
+    # idle in the pool is discarded and the query retried once on a fresh one.
+    def _pg_fetchall(self, pg_conn_string, query, params):
+        pg_pool = self._get_pg_pool(pg_conn_string)
+        for attempt in range(2):
+            conn = pg_pool.getconn()
+            try:
+                conn.autocommit = True
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(query, params)
+                    rows = cur.fetchall()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                pg_pool.putconn(conn, close=True)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                pg_pool.putconn(conn)
+                raise
+            pg_pool.putconn(conn)
+            return rows
+
+    # Extract the outputs of an unencrypted state inside PostgreSQL and return a state that
+    # holds only those outputs. This is already a single small round-trip, so it bypasses the
+    # state cache.
+    def _get_outputs_from_pg_db_schema(self, pg_conn_string, pg_schema, pg_workspace, output_names, all_outputs):
+        if all_outputs:
+            rows = self._pg_fetchall(pg_conn_string, PG_ALL_OUTPUTS_QUERY.format(schema=pg_schema), (pg_workspace,))
+        else:
+            rows = self._pg_fetchall(pg_conn_string, PG_REQUESTED_OUTPUTS_QUERY.format(schema=pg_schema), (output_names, pg_workspace))
+
+        if not rows:
+            raise AnsibleError("State not found in database")
+
+        if not rows[0]['has_outputs']:
+            return {}
+        return {'outputs': {name: {'value': value} for name, value in (rows[0]['outputs'] or {}).items()}}
+
+    # Read the state from a PostgreSQL database and handle decryption if required. Encrypted
+    # states are fetched whole and cached; the pg backend upserts the row in place (its id never
+    # changes), so the row's xmin, which moves with every update, is its version marker.
+    def _get_state_from_pg_db_schema(self, pg_conn_string, pg_schema, pg_workspace, enc_passphrase, enc_key_provider_name, cache_ttl, stream_parse, output_names, all_outputs):
+        if not PG_SCHEMA_RE.match(pg_schema):
+            raise AnsibleError(f"Invalid PostgreSQL schema name: {pg_schema}")
+
         try:
-            conn = psycopg2.connect(pg_conn_string)
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            cur.execute(f"SELECT data FROM {pg_schema}.states WHERE name = 'default'")
-            result = cur.fetchone()
+            if not enc_passphrase:
+                return self._get_outputs_from_pg_db_schema(pg_conn_string, pg_schema, pg_workspace, output_names, all_outputs)
+
+            def load_state():
+                rows = self._pg_fetchall(pg_conn_string, f"SELECT data FROM {pg_schema}.states WHERE name = %s", (pg_workspace,))
+
+                if not rows:
+                    raise AnsibleError("State not found in database")
 
-            if not result:
-                raise AnsibleError("State not found in database")
+                return json.loads(rows[0]['data'])
 
-            state = json.loads(result['data'])
-            return self._decrypt_state_if_needed(state, enc_passphrase, enc_key_provider_name, output_name)
+            cache_key = None
+            if cache_ttl > 0:
+                rows = self._pg_fetchall(pg_conn_string, f"SELECT id, xmin::text AS xmin FROM {pg_schema}.states WHERE name = %s", (pg_workspace,))
+
+                if not rows:
+                    raise AnsibleError("State not found in database")
+
+                cache_key = self._state_cache_key(
+                    ('pg', pg_conn_string, pg_schema, pg_workspace),
+                    (rows[0]['id'], rows[0]['xmin']),
+                    enc_passphrase, enc_key_provider_name
+                )
+
+            return self._load_state_cached(cache_key, cache_ttl, load_state, enc_passphrase, enc_key_provider_name, stream_parse)
         except psycopg2.Error as e:
             raise AnsibleError(f"Database error: {str(e)}")
         except ValueError as e:
             raise AnsibleError(f"Decryption or decoding error: {str(e)}")
         except Exception as e:
             raise AnsibleError(f"Error processing state from database: {str(e)}")
-        finally:
-            if 'conn' in locals():
-                conn.close()
 
-    # Main entry point for the lookup plugin
-    def run(self, terms, variables=None, **kwargs):
-        output_name = terms[0]
-        state_file_path = kwargs.get('state_file_path')
-        pg_conn_string = kwargs.get('pg_conn_string')
-        pg_schema = kwargs.get('pg_schema', 'terraform_remote_state')
-        s3_bucket = kwargs.get('s3_bucket')
-        bucket_path = kwargs.get('bucket_path')
-        aws_region = kwargs.get('aws_region', 'us-east-1')
-        aws_profile = kwargs.get('aws_profile')
-        enc_passphrase = kwargs.get('enc_passphrase', None)
-        enc_key_provider_name = kwargs.get('enc_key_provider_name', None)
+    # Read the options of one state source, falling back to defaults for unset ones
+    def _source_options(self, options):
+        source = {
+            'state_file_path': options.get('state_file_path'),
+            'pg_conn_string': options.get('pg_conn_string'),
+            'pg_schema': options.get('pg_schema', 'terraform_remote_state'),
+            'pg_workspace': options.get('pg_workspace', 'default'),
+            's3_bucket': options.get('s3_bucket'),
+            'bucket_path': options.get('bucket_path'),
+            'aws_region': options.get('aws_region', 'us-east-1'),
+            'aws_profile': options.get('aws_profile'),
+            's3_cache_dir': options.get('s3_cache_dir'),
+            'enc_passphrase': options.get('enc_passphrase', None),
+            'enc_key_provider_name': options.get('enc_key_provider_name', None),
+            'stream_parse': boolean(options.get('stream_parse', False), strict=False),
+        }
+        if source['s3_cache_dir']:
+            source['s3_cache_dir'] = os.path.expanduser(source['s3_cache_dir'])
+        try:
+            source['cache_ttl'] = int(options.get('cache_ttl', STATE_CACHE_DEFAULT_TTL))
+        except (TypeError, ValueError):
+            raise AnsibleError("'cache_ttl' must be an integer number of seconds")
 
         # Check that we have at least one source specified
-        if not any([state_file_path, pg_conn_string, (s3_bucket and bucket_path)]):
+        if not any([source['state_file_path'], source['pg_conn_string'], (source['s3_bucket'] and source['bucket_path'])]):
             raise AnsibleError("Either file path, database connection string, or S3 bucket and key required")
 
         # Check if we need to decrypt and have all required parameters
-        if enc_passphrase and not enc_key_provider_name:
+        if source['enc_passphrase'] and not source['enc_key_provider_name']:
             raise AnsibleError("If 'enc_passphrase' is provided, 'enc_key_provider_name' must also be provided")
 
+        return source
+
+    # Fetch (and decrypt) the state of one source and extract the requested outputs from it
+    def _get_outputs(self, source, output_names, all_outputs):
         try:
-            if state_file_path:
-                return self._get_state_from_file(state_file_path, enc_passphrase, enc_key_provider_name, output_name)
-            elif s3_bucket and bucket_path:
-                return self._get_state_from_s3(s3_bucket, bucket_path, aws_region, aws_profile, enc_passphrase, enc_key_provider_name, output_name)
+            if source['state_file_path']:
+                state = self._get_state_from_file(source['state_file_path'], source['enc_passphrase'], source['enc_key_provider_name'], source['cache_ttl'], source['stream_parse'])
+            elif source['s3_bucket'] and source['bucket_path']:
+                state = self._get_state_from_s3(source['s3_bucket'], source['bucket_path'], source['aws_region'], source['aws_profile'], source['enc_passphrase'], source['enc_key_provider_name'], source['cache_ttl'], source['s3_cache_dir'], source['stream_parse'])
             else:
-                return self._get_state_from_pg_db_schema(pg_conn_string, pg_schema, enc_passphrase, enc_key_provider_name, output_name)
+                state = self._get_state_from_pg_db_schema(source['pg_conn_string'], source['pg_schema'], source['pg_workspace'], source['enc_passphrase'], source['enc_key_provider_name'], source['cache_ttl'], source['stream_parse'], output_names, all_outputs)
         except Exception as e:
             raise AnsibleError(f"Error retrieving state: {str(e)}")
+
+        return self._extract_outputs(state, output_names, all_outputs)
+
+    # Read the `sources` option: a list of named sources whose unset options are inherited from
+    # the lookup's keyword arguments
+    def _named_sources(self, sources, kwargs):
+        if not isinstance(sources, list) or not sources:
+            raise AnsibleError("'sources' must be a non-empty list of state sources")
+
+        inherited = {option: kwargs[option] for option in SOURCE_OPTIONS if option in kwargs}
+        named_sources = {}
+        for source in sources:
+            if not isinstance(source, dict) or not source.get('name'):
+                raise AnsibleError("Each entry in 'sources' must be a dict with a 'name'")
+            source_name = source['name']
+            if source_name in named_sources:
+                raise AnsibleError(f"Duplicate source name '{source_name}' in 'sources'")
+            unknown_options = sorted(set(source) - set(SOURCE_OPTIONS) - {'name'})
+            if unknown_options:
+                raise AnsibleError(f"Unsupported options for source '{source_name}': {', '.join(unknown_options)}")
+
+            options = dict(inherited)
+            options.update((option, value) for option, value in source.items() if option != 'name')
+            named_sources[source_name] = self._source_options(options)
+        return named_sources
+
+    # Resolve the outputs of one named source into a dict of output name to value, timing it
+    def _get_named_source_outputs(self, source_name, source, output_names, all_outputs):
+        started = time.monotonic()
+        try:
+            values = self._get_outputs(source, output_names, all_outputs)
+        except AnsibleError as e:
+            raise AnsibleError(f"Source '{source_name}': {str(e)}")
+        finally:
+            display.vvv(f"opentofu_output: source '{source_name}' resolved in {time.monotonic() - started:.3f}s")
+
+        if all_outputs:
+            return values[0]
+        return dict(zip(output_names, values))
+
+    # Main entry point for the lookup plugin. Every output named in terms is resolved from a
+    # single fetch (and decrypt) of the state. With `sources`, several states are fetched and
+    # decrypted concurrently and the outputs are returned keyed by source name.
+    def run(self, terms, variables=None, **kwargs):
+        output_names = list(terms)
+        all_outputs = boolean(kwargs.get('all_outputs', False), strict=False)
+        sources = kwargs.get('sources')
+
+        # Either name the outputs to retrieve or ask for all of them, not both
+        if all_outputs and output_names:
+            raise AnsibleError("Output names cannot be combined with 'all_outputs'")
+        if not all_outputs and not output_names:
+            raise AnsibleError("At least one output name is required unless 'all_outputs' is set")
+
+        if sources is None:
+            return self._get_outputs(self._source_options(kwargs), output_names, all_outputs)
+
+        named_sources = self._named_sources(sources, kwargs)
+        try:
+            max_workers = int(kwargs.get('max_workers', SOURCES_MAX_WORKERS))
+        except (TypeError, ValueError):
+            raise AnsibleError("'max_workers' must be an integer")
+        max_workers = max(1, min(max_workers, SOURCES_MAX_WORKERS, len(named_sources)))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                source_name: executor.submit(self._get_named_source_outputs, source_name, source, output_names, all_outputs)
+                for source_name, source in named_sources.items()
+            }
+            return [{source_name: future.result() for source_name, future in futures.items()}]
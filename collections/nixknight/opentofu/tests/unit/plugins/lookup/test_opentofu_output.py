@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) NIXKnight
+# MIT License (see LICENSE)
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import base64
+import hashlib
+import json
+import os
+import time
+
+import pytest
+
+from ansible.errors import AnsibleError
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from ansible_collections.nixknight.opentofu.plugins.lookup import opentofu_output
+
+
+OUTPUTS = {
+    'vpc_id': {'value': 'vpc-123', 'type': 'string', 'sensitive': False},
+    'subnet_ids': {'value': ['subnet-a', 'subnet-b'], 'type': ['list', 'string'], 'sensitive': False},
+}
+
+
+def _state(resources=3):
+    return json.dumps({
+        'version': 4,
+        'outputs': OUTPUTS,
+        'resources': [
+            {'type': 'aws_instance', 'name': 'web%d' % i,
+             'instances': [{'attributes': {'id': 'i-%d' % i, 'tags': {'Name': 'web "%d"\n' % i},
+                                           'ports': [22, 80, -1.5e3], 'ebs': [], 'meta': {}, 'gone': None}}]}
+            for i in range(resources)
+        ],
+    }, indent=2).encode()
+
+
+ENC_PASSPHRASE = 'correct horse battery staple'
+ENC_KEY_PROVIDER_NAME = 'unit'
+
+
+def _encrypted_state(plain_state, hash_function='sha512', iterations=1000):
+    """Encrypt a state the way OpenTofu's pbkdf2 key provider and AES-GCM method do."""
+    salt = os.urandom(32)
+    key = hashlib.pbkdf2_hmac(hash_function, ENC_PASSPHRASE.encode('utf-8'), salt, iterations, dklen=32)
+    nonce = os.urandom(12)
+    metadata = dict(salt=base64.b64encode(salt).decode('ascii'), iterations=iterations,
+                    hash_function=hash_function, key_length=32)
+    return json.dumps({
+        'meta': {'key_provider.pbkdf2.%s' % ENC_KEY_PROVIDER_NAME: base64.b64encode(json.dumps(metadata).encode('utf-8')).decode('ascii')},
+        'encrypted_data': base64.b64encode(nonce + AESGCM(key).encrypt(nonce, plain_state, None)).decode('ascii'),
+        'encryption_version': 'v0',
+    }).encode('utf-8')
+
+
+def _scan(buf, members=('outputs',)):
+    return opentofu_output._scan_json_members(buf, members)
+
+
+def test_scan_decodes_only_the_named_members():
+    assert _scan(_state()) == {'outputs': OUTPUTS}
+    assert _scan(b'{"version": 4}') == {}
+    assert _scan(b'{}') == {}
+
+
+def test_scan_resolves_a_repeated_member_to_its_last_occurrence():
+    assert _scan(b'{"outputs": {"a": 1}, "outputs": {"b": 2}}') == {'outputs': {'b': 2}}
+
+
+@pytest.mark.parametrize('value', [
+    '[1 2 3]', '{"a" 1}', '[}}', '{]}', '[nul]', '"a\x01b"', '[{"a":1,}]', '[1,]', '{,}',
+    '[,1]', '{"a":1,,"b":2}', '01', '1.', '-', '"\\x"', '[1]]', '{"a":1}}', 'truex',
+])
+def test_scan_rejects_what_json_loads_rejects_in_skipped_values(value):
+    buf = ('{"outputs": {}, "resources": %s}' % value).encode()
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(buf)
+    with pytest.raises(json.JSONDecodeError):
+        _scan(buf)
+
+
+@pytest.mark.parametrize('value', [
+    '[]', '{}', '[[], {}]', '{"a": {}, "b": []}', '[ 1 , { "b" : [ true, false, null, -0.5e+3 ] } ]',
+    '"\\u00e9\\n\\"\\\\"', '0', '-0.0E-1',
+])
+def test_scan_accepts_valid_skipped_values(value):
+    assert _scan(('{"resources": %s, "outputs": {}}' % value).encode()) == {'outputs': {}}
+
+
+def test_scan_rejects_every_truncation_of_a_state():
+    buf = _state()
+    for end in range(len(buf.rstrip())):
+        with pytest.raises(json.JSONDecodeError):
+            _scan(buf[:end])
+
+
+def test_scan_rejects_trailing_data():
+    with pytest.raises(json.JSONDecodeError):
+        _scan(_state() + b' {}')
+
+
+def test_scan_fails_fast_on_a_large_truncated_state():
+    buf = _state(resources=2000)
+    start = time.monotonic()
+    for end in (1024, 4096, 20480, len(buf) // 2):
+        with pytest.raises(json.JSONDecodeError):
+            _scan(buf[:end])
+    # Linear in the input: the cuts above total well under a megabyte
+    assert time.monotonic() - start < 5
+
+
+@pytest.fixture
+def lookup():
+    opentofu_output._state_cache.clear()
+    opentofu_output._derived_key_cache.clear()
+    yield opentofu_output.LookupModule()
+    opentofu_output._state_cache.clear()
+    opentofu_output._derived_key_cache.clear()
+
+
+@pytest.fixture
+def state_file(tmp_path):
+    path = tmp_path / 'terraform.tfstate'
+    path.write_bytes(_state())
+    return path
+
+
+@pytest.mark.parametrize('stream_parse', [False, True])
+def test_lookup_reads_outputs_from_a_state_file(lookup, state_file, stream_parse):
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file), stream_parse=stream_parse) == ['vpc-123']
+
+
+def test_lookup_serves_unchanged_state_from_the_cache(lookup, state_file, monkeypatch):
+    parses = []
+    parse_state = lookup._parse_state
+    monkeypatch.setattr(lookup, '_parse_state', lambda *args: parses.append(args) or parse_state(*args))
+
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file)) == ['vpc-123']
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file)) == ['vpc-123']
+    assert len(parses) == 1
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file), cache_ttl=0) == ['vpc-123']
+    assert len(parses) == 2
+
+
+def test_lookup_cache_hands_out_copies(lookup, state_file):
+    lookup.run(['subnet_ids'], state_file_path=str(state_file))[0].append('subnet-x')
+    lookup.run([], state_file_path=str(state_file), all_outputs=True)[0]['subnet_ids'].clear()
+
+    assert lookup.run(['subnet_ids'], state_file_path=str(state_file)) == [['subnet-a', 'subnet-b']]
+
+
+def test_lookup_cache_keeps_only_outputs(lookup, state_file):
+    lookup.run(['vpc_id'], state_file_path=str(state_file))
+
+    (cached,) = [value for _stored_at, value in opentofu_output._state_cache._entries.values()]
+    assert json.loads(cached) == {'outputs': OUTPUTS}
+
+
+def test_lookup_cache_is_invalidated_by_a_changed_state(lookup, state_file):
+    lookup.run(['vpc_id'], state_file_path=str(state_file))
+    state = json.loads(state_file.read_bytes())
+    state['outputs']['vpc_id']['value'] = 'vpc-456'
+    state_file.write_text(json.dumps(state))
+
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file)) == ['vpc-456']
+
+
+def test_lookup_fails_on_a_truncated_state_file(lookup, state_file):
+    state_file.write_bytes(_state()[:200])
+
+    with pytest.raises(AnsibleError):
+        lookup.run(['vpc_id'], state_file_path=str(state_file), stream_parse=True)
+
+
+@pytest.mark.parametrize('hash_function', ['sha256', 'sha512'])
+@pytest.mark.parametrize('stream_parse', [False, True])
+def test_lookup_decrypts_an_encrypted_state(lookup, state_file, hash_function, stream_parse):
+    state_file.write_bytes(_encrypted_state(_state(), hash_function))
+
+    assert lookup.run(['vpc_id'], state_file_path=str(state_file), enc_passphrase=ENC_PASSPHRASE,
+                      enc_key_provider_name=ENC_KEY_PROVIDER_NAME, stream_parse=stream_parse) == ['vpc-123']
+
+
+def test_lookup_rejects_a_wrong_passphrase(lookup, state_file):
+    state_file.write_bytes(_encrypted_state(_state()))
+
+    with pytest.raises(AnsibleError, match='Decryption failed'):
+        lookup.run(['vpc_id'], state_file_path=str(state_file), enc_passphrase='wrong',
+                   enc_key_provider_name=ENC_KEY_PROVIDER_NAME)
+
+
+def test_lookup_rejects_an_unsupported_hash_function(lookup, state_file):
+    state_file.write_bytes(_encrypted_state(_state(), 'md5'))
+
+    with pytest.raises(AnsibleError, match='Unsupported PBKDF2 hash function: md5'):
+        lookup.run(['vpc_id'], state_file_path=str(state_file), enc_passphrase=ENC_PASSPHRASE,
+                   enc_key_provider_name=ENC_KEY_PROVIDER_NAME)
+
+
+def test_lookup_fails_on_a_truncated_plaintext(lookup, state_file):
+    state_file.write_bytes(_encrypted_state(_state()[:-40]))
+
+    with pytest.raises(AnsibleError, match='Decryption failed'):
+        lookup.run(['vpc_id'], state_file_path=str(state_file), enc_passphrase=ENC_PASSPHRASE,
+                   enc_key_provider_name=ENC_KEY_PROVIDER_NAME, stream_parse=True)